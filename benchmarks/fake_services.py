@@ -0,0 +1,253 @@
+"""
+Local stand-ins for the Tripo3D task API and Supabase storage, so the
+pipeline can be load-tested without paying for tasks or touching a real
+project.
+
+    python benchmarks/fake_services.py --port 8765 --processing-delay 5
+
+Point the app at it with:
+
+    TRIPO3D_BASE_URL=http://127.0.0.1:8765/tripo/v2/openapi
+    SUPABASE_URL=http://127.0.0.1:8765
+
+Tripo: POST /upload, POST /task, GET /task/{id} and the model download
+URLs a finished task returns. Tasks go queued -> running -> success (or
+failed, at --task-failure-rate) on the configured delays, and report
+running_left_time while running. GET /task fails with HTTP 500 at
+--api-error-rate, which the poller is expected to ride out.
+
+Supabase: standard object uploads and TUS resumable uploads (create,
+HEAD for the offset, PATCH chunks), failing with 503 at
+--storage-error-rate so the uploader's retries get exercised.
+"""
+import argparse
+import asyncio
+import json
+import random
+import struct
+import time
+import uuid
+
+from aiohttp import web
+
+TRIPO_PREFIX = "/tripo/v2/openapi"
+
+
+def make_glb(target_bytes: int) -> bytes:
+    """A valid triangle-soup GLB of roughly `target_bytes`, so the mobile optimizer has real work to do."""
+    # 12 bytes position + 12 bytes normal + 4 bytes index per vertex
+    vertices = max(3, target_bytes // 28 // 3 * 3)
+    rng = random.Random(vertices)
+    positions = [rng.uniform(-1, 1) for _ in range(vertices * 3)]
+    normals = [0.0, 0.0, 1.0] * vertices
+    binary = (
+        struct.pack(f"<{vertices * 3}f", *positions)
+        + struct.pack(f"<{vertices * 3}f", *normals)
+        + struct.pack(f"<{vertices}I", *range(vertices))
+    )
+    stride = vertices * 12
+    gltf = {
+        "asset": {"version": "2.0", "generator": "fake_services"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": stride, "target": 34962},
+            {"buffer": 0, "byteOffset": stride, "byteLength": stride, "target": 34962},
+            {"buffer": 0, "byteOffset": stride * 2, "byteLength": vertices * 4, "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": vertices, "type": "VEC3",
+             "min": [min(positions[i::3]) for i in range(3)], "max": [max(positions[i::3]) for i in range(3)]},
+            {"bufferView": 1, "componentType": 5126, "count": vertices, "type": "VEC3"},
+            {"bufferView": 2, "componentType": 5125, "count": vertices, "type": "SCALAR"},
+        ],
+    }
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    length = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    return (
+        struct.pack("<4sII", b"glTF", 2, length)
+        + struct.pack("<I4s", len(json_chunk), b"JSON") + json_chunk
+        + struct.pack("<I4s", len(binary), b"BIN\0") + binary
+    )
+
+
+class FakeServices:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.tasks = {}
+        self.uploads = {}
+        self.stats = {"tasks": 0, "polls": 0, "uploaded_bytes": 0, "downloaded_bytes": 0}
+        self.payloads = {
+            "glb": make_glb(args.glb_bytes),
+            "usdz": random.randbytes(args.usdz_bytes),
+        }
+
+    def _base(self, request: web.Request) -> str:
+        return f"http://{request.host}"
+
+    # Tripo
+
+    async def tripo_upload(self, request: web.Request) -> web.Response:
+        size = 0
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+        self.stats["uploaded_bytes"] += size
+        return web.json_response({"code": 0, "data": {"image_token": str(uuid.uuid4())}})
+
+    async def create_task(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        task_id = str(uuid.uuid4())
+        is_convert = body.get("type") == "convert_model"
+        processing = self.args.convert_delay if is_convert else self.args.processing_delay
+        self.tasks[task_id] = {
+            "type": body.get("type", "image_to_model"),
+            "format": str(body.get("format", "glb")).lower(),
+            "input": body,
+            "created": time.monotonic(),
+            "create_time": int(time.time()),
+            "queue": self.args.queue_delay * random.uniform(0.5, 1.5),
+            "processing": processing * random.uniform(0.8, 1.2),
+            "fails": random.random() < self.args.task_failure_rate,
+        }
+        self.stats["tasks"] += 1
+        return web.json_response({"code": 0, "data": {"task_id": task_id}})
+
+    async def get_task(self, request: web.Request) -> web.Response:
+        self.stats["polls"] += 1
+        if random.random() < self.args.api_error_rate:
+            return web.json_response({"code": 500, "message": "injected failure"}, status=500)
+        task_id = request.match_info["task_id"]
+        task = self.tasks.get(task_id)
+        if task is None:
+            return web.json_response({"code": 2001, "message": "task not found"}, status=404)
+
+        elapsed = time.monotonic() - task["created"]
+        data = {
+            "task_id": task_id,
+            "type": task["type"],
+            "input": task["input"],
+            "output": {},
+            "progress": 0,
+            "create_time": task["create_time"],
+        }
+        if elapsed < task["queue"]:
+            data.update(status="queued", queuing_num=1)
+        elif elapsed < task["queue"] + task["processing"]:
+            done = (elapsed - task["queue"]) / task["processing"]
+            left = task["queue"] + task["processing"] - elapsed
+            # Tripo's estimates are optimistic; make ours a little off too
+            data.update(status="running", progress=int(done * 100), running_left_time=max(1, int(left * 0.8)))
+        elif task["fails"]:
+            data.update(status="failed", progress=100, error_msg="injected failure")
+        else:
+            data.update(status="success", progress=100)
+            if task["type"] == "convert_model":
+                data["output"] = {"model": f"{self._base(request)}/files/{task_id}.{task['format']}"}
+            else:
+                data["output"] = {"pbr_model": f"{self._base(request)}/files/{task_id}.glb"}
+        return web.json_response({"code": 0, "data": data})
+
+    async def download(self, request: web.Request) -> web.Response:
+        extension = request.match_info["name"].rsplit(".", 1)[-1]
+        body = self.payloads.get(extension, self.payloads["usdz"])
+        self.stats["downloaded_bytes"] += len(body)
+        return web.Response(body=body, content_type="application/octet-stream")
+
+    # Supabase storage
+
+    async def _storage_delay(self) -> bool:
+        """Simulated upload latency; returns True when this request should fail."""
+        if self.args.storage_latency:
+            await asyncio.sleep(self.args.storage_latency)
+        return random.random() < self.args.storage_error_rate
+
+    async def _drain(self, request: web.Request) -> int:
+        size = 0
+        async for chunk in request.content.iter_chunked(256 * 1024):
+            size += len(chunk)
+        self.stats["uploaded_bytes"] += size
+        return size
+
+    async def object_upload(self, request: web.Request) -> web.Response:
+        await self._drain(request)
+        if await self._storage_delay():
+            return web.json_response({"error": "injected failure"}, status=503)
+        key = f"{request.match_info['bucket']}/{request.match_info['path']}"
+        return web.json_response({"Key": key})
+
+    async def tus_create(self, request: web.Request) -> web.Response:
+        if await self._storage_delay():
+            return web.json_response({"error": "injected failure"}, status=503)
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {"length": int(request.headers["Upload-Length"]), "offset": 0}
+        location = f"{self._base(request)}/storage/v1/upload/resumable/{upload_id}"
+        return web.Response(status=201, headers={"Location": location, "Tus-Resumable": "1.0.0"})
+
+    async def tus_head(self, request: web.Request) -> web.Response:
+        upload = self.uploads.get(request.match_info["upload_id"])
+        if upload is None:
+            return web.Response(status=404)
+        return web.Response(headers={"Upload-Offset": str(upload["offset"]), "Upload-Length": str(upload["length"])})
+
+    async def tus_patch(self, request: web.Request) -> web.Response:
+        upload = self.uploads.get(request.match_info["upload_id"])
+        if upload is None:
+            return web.Response(status=404)
+        if int(request.headers["Upload-Offset"]) != upload["offset"]:
+            return web.Response(status=409)
+        size = await self._drain(request)
+        if await self._storage_delay():
+            return web.json_response({"error": "injected failure"}, status=503)
+        upload["offset"] += size
+        if upload["offset"] >= upload["length"]:
+            self.uploads.pop(request.match_info["upload_id"])
+        return web.Response(status=204, headers={"Upload-Offset": str(upload["offset"])})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.add_routes([
+            web.post(f"{TRIPO_PREFIX}/upload", self.tripo_upload),
+            web.post(f"{TRIPO_PREFIX}/task", self.create_task),
+            web.get(f"{TRIPO_PREFIX}/task/{{task_id}}", self.get_task),
+            web.get("/files/{name}", self.download),
+            web.post("/storage/v1/object/{bucket}/{path:.+}", self.object_upload),
+            web.post("/storage/v1/upload/resumable", self.tus_create),
+            web.head("/storage/v1/upload/resumable/{upload_id}", self.tus_head),
+            web.patch("/storage/v1/upload/resumable/{upload_id}", self.tus_patch),
+            web.get("/stats", self.get_stats),
+        ])
+        return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Knobs shared with pipeline_load.py, which passes them through."""
+    parser.add_argument("--queue-delay", type=float, default=1.0, help="seconds a Tripo task sits queued")
+    parser.add_argument("--processing-delay", type=float, default=4.0, help="seconds a generation task runs")
+    parser.add_argument("--convert-delay", type=float, default=2.0, help="seconds a conversion task runs")
+    parser.add_argument("--task-failure-rate", type=float, default=0.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="share of GET /task answered with 500")
+    parser.add_argument("--glb-bytes", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--usdz-bytes", type=int, default=6 * 1024 * 1024)
+    parser.add_argument("--storage-latency", type=float, default=0.05, help="seconds added to each storage request")
+    parser.add_argument("--storage-error-rate", type=float, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(FakeServices(args).app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
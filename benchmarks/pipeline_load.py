@@ -0,0 +1,414 @@
+"""
+Offline load test for POST /generate-3d-model against local Tripo3D and
+Supabase stand-ins (benchmarks/fake_services.py): no API credits spent,
+no real storage touched.
+
+    python benchmarks/pipeline_load.py run --concurrency 8 --requests 32 --label my-branch
+    python benchmarks/pipeline_load.py compare benchmarks/results/main.json benchmarks/results/my-branch.json
+
+Each scenario gets a fresh app under uvicorn in a scratch directory, so
+uploads, outputs, databases and peak memory never carry over between
+scenarios or into the working tree. Every request sends freshly salted
+images so the result cache never short-circuits the pipeline.
+
+Per scenario it reports latency percentiles, requests/sec, event-loop lag
+(from the app's /metrics histogram), peak RSS of the app and its worker
+processes, and the mean time of each pipeline stage. Results are written
+to benchmarks/results/<label>.json; `compare` prints the change between
+two runs and exits non-zero when any scenario regressed past --threshold.
+
+For the /output serving path, see benchmarks/serve_load.py.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import aiohttp
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+from fake_services import add_arguments as add_fake_service_arguments  # noqa: E402
+
+# name -> (images per request, extra app environment)
+SCENARIOS = {
+    "single": (1, {}),
+    "multiview": (4, {}),
+    "multiformat": (1, {"OUTPUT_FORMATS": "glb,usdz,fbx,obj"}),
+}
+
+# Shaped like a JWT, which the Supabase client insists on; never sent anywhere real
+FAKE_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.benchmark"
+
+# Lower is better for all of these; compared by `compare`
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "loop_lag_p99_ms", "peak_rss_mb")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def _sample_image(edge: int) -> bytes:
+    """A phone-photo-sized JPEG with enough detail that resizing and encoding cost something."""
+    image = Image.radial_gradient("L").resize((edge, edge * 3 // 4)).convert("RGB")
+    image = Image.merge("RGB", (image.getchannel(0), image.getchannel(0).rotate(90), Image.effect_noise(image.size, 64)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def _tree_rss(root_pid: int) -> Optional[int]:
+    """Resident bytes of a process and all its descendants, from /proc (Linux only)."""
+    if not os.path.isdir("/proc"):
+        return None
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after its ")"
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        children = [child for child, parent in parents.items() if parent == pid]
+        tree.update(children)
+        frontier.extend(children)
+    total = 0
+    page = os.sysconf("SC_PAGE_SIZE")
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _parse_metrics(text: str) -> Dict[str, list]:
+    """Prometheus text -> {name: [(labels dict, value)]}."""
+    samples: Dict[str, list] = {}
+    pattern = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+    for line in text.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        parsed = dict(re.findall(r'(\w+)="([^"]*)"', labels or ""))
+        samples.setdefault(name, []).append((parsed, float(value)))
+    return samples
+
+
+def _histogram_quantile(samples: Dict[str, list], name: str, q: float) -> Optional[float]:
+    """Same linear interpolation within a bucket as PromQL's histogram_quantile."""
+    buckets = sorted(
+        (float(labels["le"]), count) for labels, count in samples.get(f"{name}_bucket", [])
+    )
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, lower_count = 0.0, 0.0
+    for upper, count in buckets:
+        if count >= rank:
+            if upper == float("inf"):
+                return lower
+            return lower + (upper - lower) * (rank - lower_count) / max(count - lower_count, 1e-9)
+        lower, lower_count = upper, count
+    return lower
+
+
+def _stage_means(samples: Dict[str, list]) -> Dict[str, float]:
+    counts = {
+        (labels["stage"], labels["format"]): value
+        for labels, value in samples.get("pipeline_stage_seconds_count", [])
+    }
+    means = {}
+    for labels, total in samples.get("pipeline_stage_seconds_sum", []):
+        key = (labels["stage"], labels["format"])
+        if counts.get(key):
+            means[f"{key[0]}:{key[1]}" if key[1] else key[0]] = round(1000 * total / counts[key], 1)
+    return means
+
+
+async def _drive(base: str, images: int, image: bytes, concurrency: int, total: int) -> dict:
+    latencies, outcomes = [], {}
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                form = aiohttp.FormData()
+                for i in range(images):
+                    # Bytes after the JPEG end marker are ignored by decoders but change the cache key
+                    form.add_field("files", image + uuid.uuid4().bytes, filename=f"view_{i}.jpg", content_type="image/jpeg")
+                started = time.perf_counter()
+                try:
+                    async with session.post(f"{base}/generate-3d-model", data=form) as response:
+                        body = await response.json(content_type=None)
+                    if response.status != 200:
+                        outcome = f"http_{response.status}"
+                    elif body.get("errors"):
+                        outcome = "partial"
+                    else:
+                        outcome = body.get("status", "unknown")
+                except aiohttp.ClientError as e:
+                    outcome = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "outcomes": outcomes,
+        "rps": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(1000 * _percentile(latencies, 0.50), 1),
+        "p95_ms": round(1000 * _percentile(latencies, 0.95), 1),
+        "p99_ms": round(1000 * _percentile(latencies, 0.99), 1),
+        "max_ms": round(1000 * latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+async def _run_scenario(name: str, args: argparse.Namespace, services_url: str, image: bytes) -> dict:
+    images, scenario_env = SCENARIOS[name]
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix=f"pipeline_load_{name}_")
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "TRIPO3D_BASE_URL": f"{services_url}/tripo/v2/openapi",
+        "TRIPO3D_API_KEY": "tsk_benchmark",
+        "TRIPO_DISABLE_GEO_DETECTION": "1",
+        "SUPABASE_URL": services_url,
+        "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+        "SUPABASE_BUCKET": "benchmark",
+        "TRACE_LOGS": "false",
+        **dict(pair.split("=", 1) for pair in args.env),
+        **scenario_env,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", REPO_ROOT,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    peak_rss = 0
+    try:
+        await _wait_until_up(base + "/metrics")
+
+        async def sample_rss():
+            nonlocal peak_rss
+            while True:
+                peak_rss = max(peak_rss, await asyncio.to_thread(_tree_rss, server.pid) or 0)
+                await asyncio.sleep(0.2)
+
+        sampler = asyncio.create_task(sample_rss())
+        try:
+            result = await _drive(base, images, image, args.concurrency, args.requests)
+        finally:
+            sampler.cancel()
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(base + "/metrics") as response:
+                samples = _parse_metrics(await response.text())
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    lag_p50 = _histogram_quantile(samples, "event_loop_lag_seconds", 0.50)
+    lag_p99 = _histogram_quantile(samples, "event_loop_lag_seconds", 0.99)
+    return {
+        **result,
+        "images": images,
+        "loop_lag_p50_ms": round(1000 * lag_p50, 2) if lag_p50 is not None else None,
+        "loop_lag_p99_ms": round(1000 * lag_p99, 2) if lag_p99 is not None else None,
+        "peak_rss_mb": round(peak_rss / 1e6, 1) if peak_rss else None,
+        "stage_ms": _stage_means(samples),
+    }
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    services_port = _free_port()
+    fake_args = []
+    for action in ("queue_delay", "processing_delay", "convert_delay", "task_failure_rate", "api_error_rate",
+                   "glb_bytes", "usdz_bytes", "storage_latency", "storage_error_rate"):
+        fake_args += [f"--{action.replace('_', '-')}", str(getattr(args, action))]
+    services = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "benchmarks", "fake_services.py"), "--port", str(services_port), *fake_args]
+    )
+    services_url = f"http://127.0.0.1:{services_port}"
+    image = _sample_image(args.image_edge)
+    try:
+        await _wait_until_up(services_url + "/stats")
+        report = {}
+        for name in args.scenarios:
+            print(f"▶ {name}: {args.requests} requests at concurrency {args.concurrency}", flush=True)
+            report[name] = await _run_scenario(name, args, services_url, image)
+        return report
+    finally:
+        services.terminate()
+        services.wait()
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_report(report: dict):
+    print(f"{'scenario':<13}{'req':>5}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'lag p99':>9}{'RSS MB':>8}  outcomes")
+    for name, r in report.items():
+        lag = f"{r['loop_lag_p99_ms']:.1f}" if r["loop_lag_p99_ms"] is not None else "-"
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+        print(f"{name:<13}{r['requests']:>5}{r['rps']:>8.2f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}"
+              f"{r['p99_ms']:>9.0f}{lag:>9}{rss:>8}  {r['outcomes']}")
+    for name, r in report.items():
+        stages = ", ".join(f"{stage} {ms:.0f}" for stage, ms in r["stage_ms"].items())
+        print(f"  {name} stage means (ms): {stages}")
+
+
+def run(args: argparse.Namespace):
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(_run(args))
+    _print_report(report)
+
+    label = args.label or time.strftime("%Y%m%d-%H%M%S")
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{label}.json")
+    settings = {k: v for k, v in vars(args).items() if k not in ("func", "output", "label", "verbose")}
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "label": label,
+                "revision": _git_revision(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "settings": settings,
+                "scenarios": report,
+            },
+            f,
+            indent=2,
+        )
+    print(f"💾 Saved {path}")
+
+
+def compare(args: argparse.Namespace):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline["settings"] != candidate["settings"]:
+        print("⚠️ The runs used different settings; deltas may not mean much")
+
+    regressions = []
+    print(f"{baseline['label']} -> {candidate['label']}")
+    print(f"{'scenario':<13}{'metric':<17}{'before':>10}{'after':>10}{'change':>9}")
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            continue
+        for metric in ("rps", *COMPARED):
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = 100 * (new - old) / old
+            # Throughput regresses when it drops, everything else when it grows
+            worse = -change if metric == "rps" else change
+            flag = "  ⚠️" if worse > args.threshold else ""
+            if flag:
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<13}{metric:<17}{old:>10.1f}{new:>10.1f}{change:>+8.1f}%{flag}")
+
+    if regressions:
+        print(f"❌ Regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print("✅ No regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="load-test the app and save the results")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int, default=32, help="requests per scenario")
+    run_parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), metavar="NAME",
+                            help=f"any of: {', '.join(SCENARIOS)}")
+    run_parser.add_argument("--image-edge", type=int, default=3000, help="long edge of the uploaded photos")
+    run_parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                            help="extra app setting, e.g. --env TRIPO_POLL_INTERVAL=1")
+    run_parser.add_argument("--label", help="results file name; defaults to a timestamp")
+    run_parser.add_argument("--output", default=RESULTS_DIR)
+    run_parser.add_argument("--verbose", action="store_true", help="show the app's output")
+    add_fake_service_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="diff two saved runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Load test for /output model serving: the previous StaticFiles handler vs
+utils.model_server.
+
+    python benchmarks/serve_load.py --concurrency 32 --duration 10
+
+Both apps run under uvicorn in a scratch copy of output/, so the
+precompressed variants it writes never land in the working tree.
+Scenarios mirror what AR viewers do: re-fetching a thumbnail, revalidating
+with If-None-Match, downloading a GLB, and resuming a GLB with Range.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SAMPLE_GLB = os.path.join(REPO_ROOT, "tests", "fixtures", "554b0174-7627-4b6f-b283-f0ff4c3da8df_pbr.glb")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.staticfiles import StaticFiles  # noqa: E402
+
+def baseline_app() -> FastAPI:
+    """
+    The handler as it was: StaticFiles mounted at /output. A factory, so it's
+    built in the uvicorn child whose cwd is the scratch copy, not at import.
+    """
+    app = FastAPI()
+    app.mount("/output", StaticFiles(directory="./output"), name="output")
+    return app
+
+
+def candidate_app() -> FastAPI:
+    from utils.model_server import serve_output_file
+
+    app = FastAPI()
+
+    @app.api_route("/output/{file_path:path}", methods=["GET", "HEAD"])
+    async def serve_model(request: Request, file_path: str):
+        return await serve_output_file(request, file_path)
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_until_up(url: str):
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(url):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def _run_scenario(base: str, path: str, headers: dict, concurrency: int, duration: float) -> dict:
+    latencies, statuses, transferred = [], {}, 0
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as session:
+        async def worker():
+            nonlocal transferred
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                async with session.get(base + path, headers=headers) as response:
+                    body = await response.read()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                transferred += len(body)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p99_ms": 1000 * latencies[int(len(latencies) * 0.99) - 1],
+        "mb": transferred / 1e6,
+        "statuses": statuses,
+    }
+
+
+async def _etag_for(base: str, path: str) -> str:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base + path) as response:
+            await response.read()
+            return response.headers.get("ETag", "")
+
+
+async def _bench_app(app_name: str, workdir: str, scenarios: dict, concurrency: int, duration: float) -> dict:
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"serve_load:{app_name}", "--factory",
+         "--app-dir", os.path.join(REPO_ROOT, "benchmarks"), "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        await _wait_until_up(base + "/output/")
+        results = {}
+        for name, (path, headers) in scenarios.items():
+            if headers.get("If-None-Match") == "<etag>":
+                headers = {**headers, "If-None-Match": await _etag_for(base, path)}
+            results[name] = await _run_scenario(base, path, headers, concurrency, duration)
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    from utils.model_server import precompress
+
+    workdir = tempfile.mkdtemp(prefix="serve_load_")
+    try:
+        shutil.copytree(os.path.join(REPO_ROOT, "output"), os.path.join(workdir, "output"))
+        glb_dir = os.path.join(workdir, "output", "glb")
+        os.makedirs(glb_dir, exist_ok=True)
+        glb = os.path.basename(SAMPLE_GLB)
+        shutil.copy(SAMPLE_GLB, glb_dir)
+        thumb = sorted(os.listdir(os.path.join(workdir, "output", "thumbnail")))[0]
+        # Done at write time in the pipeline
+        precompress(os.path.join(glb_dir, glb))
+
+        glb_size = os.path.getsize(os.path.join(glb_dir, glb))
+        scenarios = {
+            "thumbnail": (f"/output/thumbnail/{thumb}", {}),
+            "thumbnail_revalidate": (f"/output/thumbnail/{thumb}", {"If-None-Match": "<etag>"}),
+            "glb_download": (f"/output/glb/{glb}", {"Accept-Encoding": "br, gzip"}),
+            "glb_resume": (f"/output/glb/{glb}", {"Range": f"bytes={glb_size // 2}-"}),
+        }
+
+        report = {}
+        for label, app_name in (("baseline", "baseline_app"), ("model_server", "candidate_app")):
+            report[label] = asyncio.run(_bench_app(app_name, workdir, scenarios, args.concurrency, args.duration))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'scenario':<22}{'handler':<14}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'MB':>9}  statuses")
+    for scenario in scenarios:
+        for label in report:
+            r = report[label][scenario]
+            print(
+                f"{scenario:<22}{label:<14}{r['rps']:>9.0f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                f"{r['mb']:>9.1f}  {r['statuses']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
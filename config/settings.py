@@ -4,3 +4,80 @@ import os
 load_dotenv()
 
 TRIPO3D_API_KEY = os.getenv("TRIPO3D_API_KEY")
+
+# Local storage
+UPLOAD_DIR = "./uploads"
+OUTPUT_DIR = "./output"
+OUTPUT_GLB = "./output/glb"
+OUTPUT_USDZ = "./output/usdz"
+
+# Background jobs
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "./jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "20"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+
+# Result cache
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "./cache.db")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+
+# Supabase uploads
+SUPABASE_UPLOAD_CONCURRENCY = int(os.getenv("SUPABASE_UPLOAD_CONCURRENCY", "4"))
+SUPABASE_UPLOAD_RETRIES = int(os.getenv("SUPABASE_UPLOAD_RETRIES", "3"))
+SUPABASE_UPLOAD_TIMEOUT = float(os.getenv("SUPABASE_UPLOAD_TIMEOUT", "300"))
+# Files at or above this size use the resumable (TUS) endpoint.
+SUPABASE_RESUMABLE_THRESHOLD = int(os.getenv("SUPABASE_RESUMABLE_THRESHOLD", str(6 * 1024 * 1024)))
+# Supabase requires 6 MB chunks for resumable uploads.
+SUPABASE_CHUNK_SIZE = 6 * 1024 * 1024
+
+# Tripo3D task polling
+# Override to point the SDK at another deployment, e.g. benchmarks/fake_services.py
+TRIPO3D_BASE_URL = os.getenv("TRIPO3D_BASE_URL")
+TRIPO_POLL_INTERVAL = float(os.getenv("TRIPO_POLL_INTERVAL", "3"))
+TRIPO_POLL_MAX_INTERVAL = float(os.getenv("TRIPO_POLL_MAX_INTERVAL", "20"))
+TRIPO_MAX_RPS = float(os.getenv("TRIPO_MAX_RPS", "5"))
+TRIPO_MAX_CONCURRENT_POLLS = int(os.getenv("TRIPO_MAX_CONCURRENT_POLLS", "10"))
+TRIPO_TASK_TIMEOUT = float(os.getenv("TRIPO_TASK_TIMEOUT", "1800"))
+
+# Worker processes for CPU-bound work (image and model processing)
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Image preprocessing
+OUTPUT_THUMBNAIL = "./output/thumbnail"
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "2048"))
+# JPEG, PNG or WEBP; anything else is refused at startup
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "88"))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "256"))
+PLACEHOLDER_SIZE = int(os.getenv("PLACEHOLDER_SIZE", "16"))
+
+# Mobile GLB optimisation
+GLB_OPTIMIZE = os.getenv("GLB_OPTIMIZE", "true").lower() in ("1", "true", "yes")
+GLB_TEXTURE_MAX_SIZE = int(os.getenv("GLB_TEXTURE_MAX_SIZE", "1024"))
+GLB_TEXTURE_QUALITY = int(os.getenv("GLB_TEXTURE_QUALITY", "85"))
+
+# Model file serving
+SERVE_CACHE_BYTES = int(os.getenv("SERVE_CACHE_BYTES", str(32 * 1024 * 1024)))
+SERVE_CACHE_MAX_FILE = int(os.getenv("SERVE_CACHE_MAX_FILE", str(256 * 1024)))
+SERVE_ETAG_CACHE_SIZE = int(os.getenv("SERVE_ETAG_CACHE_SIZE", "10000"))
+SERVE_IMMUTABLE_MAX_AGE = int(os.getenv("SERVE_IMMUTABLE_MAX_AGE", str(365 * 24 * 3600)))
+SERVE_DEFAULT_MAX_AGE = int(os.getenv("SERVE_DEFAULT_MAX_AGE", "60"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "9"))
+
+# Upload limits and local disk lifecycle
+MAX_UPLOAD_FILES = int(os.getenv("MAX_UPLOAD_FILES", "8"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+LIFECYCLE_DB_PATH = os.getenv("LIFECYCLE_DB_PATH", "./lifecycle.db")
+DISK_BUDGET_BYTES = int(os.getenv("DISK_BUDGET_BYTES", str(5 * 1024 ** 3)))
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", "300"))
+WORKSPACE_MAX_AGE = int(os.getenv("WORKSPACE_MAX_AGE", str(24 * 3600)))
+
+# Observability; metrics are kept per process, so /metrics assumes a single uvicorn worker
+TRACE_LOGS = os.getenv("TRACE_LOGS", "true").lower() in ("1", "true", "yes")
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+
+# Formats generated for every request; anything but GLB is a Tripo conversion
+OUTPUT_FORMATS = [fmt.strip().lower() for fmt in os.getenv("OUTPUT_FORMATS", "glb,usdz").split(",") if fmt.strip()]
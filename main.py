@@ -1,18 +1,48 @@
+import asyncio
+import json
 import os
-import shutil
-import time
+from contextlib import asynccontextmanager
 from typing import List
 
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
-
-from utils.tripo_sdk_client import generate_3d_from_images
-from utils.supabase_client import upload_to_supabase
-
-app = FastAPI(title="Tripo3D Backend", version="1.2.0")
-
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from config.settings import UPLOAD_DIR, OUTPUT_DIR, OUTPUT_GLB, OUTPUT_USDZ, OUTPUT_THUMBNAIL
+from utils import disk_janitor, job_store, metrics, result_cache
+from utils.job_queue import start_workers, stop_workers, submit_job
+from utils.model_server import serve_output_file
+from utils.pipeline import run_pipeline, pipeline_cache_key
+from utils.process_pool import shutdown_process_pool
+from utils.supabase_client import close_session as close_supabase_session
+from utils.tripo_sdk_client import open_client as open_tripo_client, close_client as close_tripo_client
+from utils.workspace import UploadRejectedError, UploadSizeLimitMiddleware, new_workspace, remove_workspace, save_uploads
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(result_cache.init_db)
+    try:
+        await open_tripo_client()
+    except ValueError as e:
+        # Missing/invalid key: keep serving, generation requests will report the error
+        print("⚠️ Tripo3D client not opened:", e)
+    await start_workers()
+    await disk_janitor.start_janitor()
+    lag_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    yield
+    lag_monitor.cancel()
+    await disk_janitor.stop_janitor()
+    await stop_workers()
+    await close_tripo_client()
+    await close_supabase_session()
+    shutdown_process_pool()
+
+
+app = FastAPI(title="Tripo3D Backend", version="1.2.0", lifespan=lifespan)
+
+# Added first so CORS headers still wrap its 413s
+app.add_middleware(UploadSizeLimitMiddleware, paths=("/generate-3d-model",))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -21,87 +51,168 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "./uploads"
-OUTPUT_DIR = "./output"
-OUTPUT_GLB = "./output/glb"
-OUTPUT_USDZ = "./output/usdz"
-
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(OUTPUT_GLB, exist_ok=True)
 os.makedirs(OUTPUT_USDZ, exist_ok=True)
-
-app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
+os.makedirs(OUTPUT_THUMBNAIL, exist_ok=True)
 
 
 @app.post("/generate-3d-model")
-async def generate_3d_model(files: List[UploadFile] = File(...)):
-    saved_files = []
-
-    # Save uploaded images
-    for f in files:
-        save_path = os.path.join(UPLOAD_DIR, f.filename)
-        with open(save_path, "wb") as buffer:
-            shutil.copyfileobj(f.file, buffer)
-        saved_files.append(save_path)
-
-    print(f"📸 Received {len(saved_files)} images. Generating model...")
-
-    # Generate GLB + USDZ
-    result = await generate_3d_from_images(saved_files, formats=["glb", "usdz"])
-
-    if result.get("status") != "success":
-        return result
-
-    bucket = os.getenv("SUPABASE_BUCKET")
-    supabase_urls = {"glb": [], "usdz": [], "thumbnail": None}
-
-    def upload(filepath: str, folder: str):
-        filename = os.path.basename(filepath)
-        dest = f"models/{folder}/{int(time.time())}_{filename}"
-        return upload_to_supabase(filepath, dest, bucket)
-
-    # ------------------------
-    # 1️⃣ Upload GLB
-    # ------------------------
-    glb_local = result.get("pbr_model")
-
-    if glb_local and os.path.exists(glb_local):
-        new_glb_path = os.path.join(OUTPUT_GLB, os.path.basename(glb_local))
-        shutil.move(glb_local, new_glb_path)
-        glb_url = upload(new_glb_path, "glb")
-        supabase_urls["glb"].append(glb_url)
-
-    # ------------------------
-    # 2️⃣ Upload USDZ
-    # ------------------------
-    for usdz in result.get("files", {}).get("usdz", []):
-        new_usdz_path = os.path.join(OUTPUT_USDZ, os.path.basename(usdz))
-        shutil.move(usdz, new_usdz_path)
-        url = upload(new_usdz_path, "usdz")
-        supabase_urls["usdz"].append(url)
-
-    # ------------------------
-    # 3️⃣ Upload thumbnail (first input image)
-    # ------------------------
-    if saved_files:
-        print("⬆️ Uploading thumbnail...")
-        first_image = saved_files[0]
-        thumbnail_url = upload(first_image, "thumbnails")
-        supabase_urls["thumbnail"] = thumbnail_url
-
-    print("🚀 Upload complete:", supabase_urls)
-
-    return {
-        "status": "success",
-        "message": "Models generated & uploaded",
-        "file_urls": supabase_urls
-    }
-
-
-@app.get("/output/{filename}")
-async def serve_model(filename: str):
-    file_path = os.path.join(OUTPUT_DIR, filename)
-    if not os.path.exists(file_path):
-        return {"error": "Not found"}
-    return FileResponse(file_path)
+async def generate_3d_model(files: List[UploadFile] = File(...), mode: str = "sync"):
+    """
+    mode=sync (default) holds the request open until the models are uploaded.
+    mode=job persists the uploads, queues a background job and returns its id.
+    """
+    job_id = job_store.new_job_id()
+    # Ties this request's trace lines together, and to the job's if queued
+    metrics.correlation_id.set(job_id)
+    # Each request gets its own directory, so same-named uploads never collide
+    workspace = new_workspace(job_id)
+    try:
+        with metrics.timed("save_uploads"):
+            saved_files = await save_uploads(files, workspace)
+    except UploadRejectedError as e:
+        await remove_workspace(workspace)
+        return JSONResponse(status_code=e.status_code, content={"status": "error", "message": str(e)})
+
+    if mode == "job":
+        cache_key = await pipeline_cache_key(saved_files)
+
+        cached = await asyncio.to_thread(result_cache.lookup, cache_key)
+        if cached is not None:
+            await remove_workspace(workspace)
+            # Same job contract as a miss, the job just starts out done
+            await asyncio.to_thread(
+                job_store.create_finished_job, job_id, {**cached, "cached": True}, cache_key
+            )
+            print(f"♻️ Job {job_id} served from cache")
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "status": job_store.DONE,
+                    "job_id": job_id,
+                    "status_url": f"/jobs/{job_id}",
+                    "events_url": f"/jobs/{job_id}/events",
+                    "cached": True,
+                },
+            )
+
+        try:
+            job = await submit_job(job_id, saved_files, cache_key)
+        except job_store.QueueFullError:
+            await remove_workspace(workspace)
+            return JSONResponse(
+                status_code=429,
+                content={"status": "error", "message": "Too many jobs queued, retry later"},
+                headers={"Retry-After": "30"},
+            )
+
+        if job["job_id"] != job_id:
+            # Same images are already being generated; follow that job instead
+            await remove_workspace(workspace)
+            job_id = job["job_id"]
+            print(f"🔗 Coalesced onto job {job_id}")
+        else:
+            print(f"📥 Queued job {job_id} with {len(saved_files)} images")
+
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "queued",
+                "job_id": job_id,
+                "status_url": f"/jobs/{job_id}",
+                "events_url": f"/jobs/{job_id}/events",
+            },
+        )
+
+    try:
+        return await run_pipeline(saved_files)
+    finally:
+        await remove_workspace(workspace)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_store.get_job, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    job.pop("files", None)
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events stream of a job's stage changes.
+    Reads from the shared job store, so it works whichever worker runs the job.
+    """
+    if await asyncio.to_thread(job_store.get_job, job_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+
+    async def stream():
+        last_stage = None
+        idle = 0.0
+        while True:
+            job = await asyncio.to_thread(job_store.get_job, job_id)
+            if job["stage"] != last_stage:
+                last_stage = job["stage"]
+                idle = 0.0
+                payload = {"job_id": job_id, "stage": job["stage"], "updated_at": job["updated_at"]}
+                if job["stage"] in job_store.TERMINAL_STAGES:
+                    payload["result"] = job["result"]
+                    payload["error"] = job["error"]
+                yield f"event: stage\ndata: {json.dumps(payload)}\n\n"
+                if job["stage"] in job_store.TERMINAL_STAGES:
+                    return
+            elif idle >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(0.5)
+            idle += 0.5
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.delete("/cache/{key}")
+async def invalidate_cache_entry(key: str):
+    removed = await asyncio.to_thread(result_cache.invalidate, key)
+    if not removed:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    return {"status": "success", "removed": 1}
+
+
+@app.delete("/cache")
+async def clear_cache():
+    removed = await asyncio.to_thread(result_cache.clear)
+    return {"status": "success", "removed": removed}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus text exposition of this process's pipeline metrics. Counters
+    live in process memory, so run a single uvicorn worker (as start.sh does)
+    or scrape each worker separately; only `jobs` comes from the shared store.
+    """
+    counts = await asyncio.to_thread(job_store.count_by_stage)
+    # Stages with no rows are missing from counts; don't keep reporting their last value
+    for stage in (job_store.QUEUED, *job_store.ACTIVE_STAGES, *job_store.TERMINAL_STAGES, *counts):
+        metrics.JOBS.set(counts.get(stage, 0), stage=stage)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/storage")
+async def storage_usage():
+    """Local disk usage against DISK_BUDGET_BYTES and janitor eviction totals."""
+    return await asyncio.to_thread(disk_janitor.usage)
+
+
+@app.api_route("/output/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_model(request: Request, file_path: str):
+    return await serve_output_file(request, file_path)
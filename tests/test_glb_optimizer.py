@@ -0,0 +1,143 @@
+import io
+import mmap
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from config.settings import GLB_TEXTURE_MAX_SIZE
+from utils.glb_optimizer import _read_accessor, optimize_glb, read_glb, write_glb
+
+# A real Tripo3D PBR model: textured, indexed, one mesh
+SAMPLE_GLB = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "554b0174-7627-4b6f-b283-f0ff4c3da8df_pbr.glb"
+)
+
+
+def _load(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        document, binary = read_glb(mm)
+        data = bytes(binary)
+        binary.release()
+    return document, memoryview(data)
+
+
+def _accessor(document, binary, index):
+    return _read_accessor(document, binary, document["accessors"][index])
+
+
+def _dequantize(values, accessor):
+    if not accessor.get("normalized"):
+        return values.astype(np.float64)
+    # KHR_mesh_quantization: signed types map to [-1, 1], unsigned to [0, 1]
+    info = np.iinfo(values.dtype)
+    return np.maximum(values / info.max, -1.0)
+
+
+def _mesh_nodes(document):
+    return {node["mesh"]: node for node in document["nodes"] if "mesh" in node}
+
+
+def _image_bytes(document, binary, image):
+    view = document["bufferViews"][image["bufferView"]]
+    start = view.get("byteOffset", 0)
+    return bytes(binary[start:start + view["byteLength"]])
+
+
+def _texture_images(document):
+    """Material slot -> name of the image it ends up sampling."""
+    images = {}
+    for m, material in enumerate(document.get("materials", [])):
+        slots = {**material.get("pbrMetallicRoughness", {}), **material}
+        for slot, ref in slots.items():
+            if isinstance(ref, dict) and "index" in ref:
+                source = document["textures"][ref["index"]]["source"]
+                images[(m, slot)] = document["images"][source]["name"]
+    return images
+
+
+@pytest.fixture(scope="module")
+def optimized(tmp_path_factory):
+    dst = str(tmp_path_factory.mktemp("glb") / "sample_mobile.glb")
+    stats = optimize_glb(SAMPLE_GLB, dst)
+    return stats, _load(SAMPLE_GLB), _load(dst)
+
+
+def test_output_is_smaller_and_declares_quantization(optimized):
+    stats, _, (document, _) = optimized
+    assert stats["optimized_bytes"] < stats["original_bytes"]
+    assert "KHR_mesh_quantization" in document["extensionsRequired"]
+
+
+def test_positions_round_trip(optimized):
+    _, (src, src_bin), (dst, dst_bin) = optimized
+    src_nodes, dst_nodes = _mesh_nodes(src), _mesh_nodes(dst)
+
+    for mesh_index, mesh in enumerate(src["meshes"]):
+        node = dst_nodes[mesh_index]
+        # The mesh moved under a child node that undoes the quantization
+        assert node is not src_nodes[mesh_index]
+        translation = np.array(node.get("translation", [0, 0, 0]))
+        scale = np.array(node.get("scale", [1, 1, 1]))
+
+        for src_prim, dst_prim in zip(mesh["primitives"], dst["meshes"][mesh_index]["primitives"]):
+            original = _accessor(src, src_bin, src_prim["attributes"]["POSITION"])
+            accessor = dst["accessors"][dst_prim["attributes"]["POSITION"]]
+            quantized = _read_accessor(dst, dst_bin, accessor)
+            assert quantized.dtype == np.int16
+
+            restored = _dequantize(quantized, accessor) * scale + translation
+            # Within one quantization step of the original
+            np.testing.assert_allclose(restored, original, rtol=0, atol=float(scale.max()))
+
+
+def test_other_attributes_round_trip(optimized):
+    _, (src, src_bin), (dst, dst_bin) = optimized
+    for mesh_index, mesh in enumerate(src["meshes"]):
+        for src_prim, dst_prim in zip(mesh["primitives"], dst["meshes"][mesh_index]["primitives"]):
+            for semantic, tolerance in (("NORMAL", 1 / 127), ("TEXCOORD_0", 1 / 65535)):
+                if semantic not in src_prim["attributes"]:
+                    continue
+                original = _accessor(src, src_bin, src_prim["attributes"][semantic])
+                accessor = dst["accessors"][dst_prim["attributes"][semantic]]
+                restored = _dequantize(_read_accessor(dst, dst_bin, accessor), accessor)
+                np.testing.assert_allclose(restored, original, rtol=0, atol=tolerance)
+
+
+def test_indices_round_trip(optimized):
+    _, (src, src_bin), (dst, dst_bin) = optimized
+    for mesh_index, mesh in enumerate(src["meshes"]):
+        for src_prim, dst_prim in zip(mesh["primitives"], dst["meshes"][mesh_index]["primitives"]):
+            original = _accessor(src, src_bin, src_prim["indices"])
+            narrowed = _accessor(dst, dst_bin, dst_prim["indices"])
+            assert narrowed.dtype == np.uint16
+            np.testing.assert_array_equal(narrowed.astype(np.uint32), original)
+
+
+def test_texture_references_resolve(optimized):
+    _, (src, _), (dst, dst_bin) = optimized
+    assert _texture_images(dst) == _texture_images(src)
+
+    for texture in dst["textures"]:
+        image = dst["images"][texture["source"]]
+        with Image.open(io.BytesIO(_image_bytes(dst, dst_bin, image))) as decoded:
+            assert decoded.format.lower() in image["mimeType"]
+            assert max(decoded.size) <= GLB_TEXTURE_MAX_SIZE
+
+
+def test_unused_images_are_dropped_and_sources_remapped(tmp_path):
+    document, binary = _load(SAMPLE_GLB)
+    # An image nothing samples, ahead of the used ones so every source shifts
+    document["images"].insert(0, {**document["images"][0], "name": "unused"})
+    for texture in document["textures"]:
+        texture["source"] += 1
+    src = str(tmp_path / "with_unused.glb")
+    write_glb(src, document, bytes(binary))
+
+    dst = str(tmp_path / "with_unused_mobile.glb")
+    optimize_glb(src, dst)
+    optimized_document, _ = _load(dst)
+
+    assert "unused" not in [image["name"] for image in optimized_document["images"]]
+    assert _texture_images(optimized_document) == _texture_images(document)
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import re
+import shutil
+import sqlite3
+import time
+from typing import Dict, Optional
+
+from config.settings import (
+    UPLOAD_DIR,
+    OUTPUT_DIR,
+    LIFECYCLE_DB_PATH,
+    DISK_BUDGET_BYTES,
+    JANITOR_INTERVAL,
+    WORKSPACE_MAX_AGE,
+)
+from utils.sqlite_db import connect
+
+# Evict down to this fraction of the budget so we don't thrash at the limit
+LOW_WATERMARK = 0.9
+# Sidecar files that belong to an artifact and go with it
+VARIANT_SUFFIXES = (".br", ".gz")
+
+# Names the pipeline writes under OUTPUT_DIR: Tripo downloads ({task_id}_pbr.glb
+# and friends), their mobile variants, and thumb_{cache key}.jpg thumbnails
+PIPELINE_OUTPUT = re.compile(
+    r"(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_(?:model|base|pbr)(?:_mobile)?\.\w+"
+    r"|thumb_[0-9a-f]{16}\.jpg)",
+    re.I,
+)
+
+# Recent reads from this process, flushed to the database on each sweep
+_accessed: Dict[str, float] = {}
+_janitor: Optional[asyncio.Task] = None
+
+
+def _connect():
+    return connect(LIFECYCLE_DB_PATH)
+
+
+def init_db():
+    with _connect() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY,
+                bytes INTEGER NOT NULL,
+                uploaded_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+
+def mark_uploaded(path: str):
+    """Record that `path` is safely in Supabase, so the janitor may delete the local copy."""
+    path = os.path.realpath(path)
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts (path, bytes, uploaded_at, last_access) VALUES (?, ?, ?, ?)",
+            (path, os.path.getsize(path), now, now),
+        )
+
+
+def note_access(path: str):
+    """Cheap in-memory touch from the serving path; persisted by the next sweep."""
+    _accessed[os.path.realpath(path)] = time.time()
+
+
+def _flush_accesses():
+    if not _accessed:
+        return
+    pending = list(_accessed.items())
+    _accessed.clear()
+    with _connect() as conn:
+        conn.executemany(
+            "UPDATE artifacts SET last_access = MAX(last_access, ?) WHERE path = ?",
+            [(ts, path) for path, ts in pending],
+        )
+
+
+def _dir_usage(root: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _bump(conn: sqlite3.Connection, name: str, amount: int):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+        (name, amount, amount),
+    )
+
+
+def _remove_stale_workspaces() -> int:
+    """Workspaces are deleted when their job ends; this catches ones left by crashes."""
+    removed = 0
+    cutoff = time.time() - WORKSPACE_MAX_AGE
+    for entry in os.scandir(UPLOAD_DIR):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def _remove_orphaned_outputs() -> int:
+    """
+    Pipeline outputs never recorded by mark_uploaded (failed or abandoned runs)
+    aren't candidates for eviction; delete them once they're as old as a stale workspace.
+    Anything else under OUTPUT_DIR was put there by hand and is left alone.
+    """
+    removed = 0
+    cutoff = time.time() - WORKSPACE_MAX_AGE
+    with _connect() as conn:
+        recorded = {row["path"] for row in conn.execute("SELECT path FROM artifacts")}
+    for dirpath, _, filenames in os.walk(OUTPUT_DIR):
+        for name in filenames:
+            path = os.path.realpath(os.path.join(dirpath, name))
+            artifact = next((path[:-len(s)] for s in VARIANT_SUFFIXES if path.endswith(s)), path)
+            if artifact in recorded or not PIPELINE_OUTPUT.fullmatch(os.path.basename(artifact)):
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def sweep() -> dict:
+    """
+    One janitor pass: drop stale workspaces and orphaned outputs, then evict
+    uploaded artifacts least-recently-used first until usage is under the disk budget.
+    """
+    _flush_accesses()
+    workspaces = _remove_stale_workspaces()
+    orphans = _remove_orphaned_outputs()
+
+    usage = _dir_usage(UPLOAD_DIR) + _dir_usage(OUTPUT_DIR)
+    evicted, freed = 0, 0
+    if usage > DISK_BUDGET_BYTES:
+        target = usage - DISK_BUDGET_BYTES * LOW_WATERMARK
+        with _connect() as conn:
+            rows = conn.execute("SELECT path FROM artifacts ORDER BY last_access").fetchall()
+            for row in rows:
+                if freed >= target:
+                    break
+                for path in (row["path"], *(row["path"] + s for s in VARIANT_SUFFIXES)):
+                    try:
+                        size = os.path.getsize(path)
+                        os.remove(path)
+                        freed += size
+                    except FileNotFoundError:
+                        pass
+                conn.execute("DELETE FROM artifacts WHERE path = ?", (row["path"],))
+                evicted += 1
+            _bump(conn, "evictions", evicted)
+            _bump(conn, "evicted_bytes", freed)
+
+    if workspaces or orphans or evicted:
+        print(
+            f"🧹 Janitor removed {workspaces} stale workspaces and {orphans} orphaned outputs, "
+            f"evicted {evicted} files ({freed // 1024 // 1024} MB)"
+        )
+    return {"stale_workspaces": workspaces, "orphaned_outputs": orphans, "evicted": evicted, "freed_bytes": freed}
+
+
+def usage() -> dict:
+    with _connect() as conn:
+        counters = {row["name"]: row["value"] for row in conn.execute("SELECT name, value FROM counters")}
+        evictable = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM artifacts").fetchone()
+    uploads, outputs = _dir_usage(UPLOAD_DIR), _dir_usage(OUTPUT_DIR)
+    return {
+        "budget_bytes": DISK_BUDGET_BYTES,
+        "used_bytes": uploads + outputs,
+        "uploads_bytes": uploads,
+        "output_bytes": outputs,
+        "evictable_files": evictable[0],
+        "evictable_bytes": evictable[1],
+        "evictions": counters.get("evictions", 0),
+        "evicted_bytes": counters.get("evicted_bytes", 0),
+    }
+
+
+async def _janitor_loop():
+    while True:
+        try:
+            await asyncio.to_thread(sweep)
+        except Exception as e:
+            print("⚠️ Janitor sweep failed:", e)
+        await asyncio.sleep(JANITOR_INTERVAL)
+
+
+async def start_janitor():
+    global _janitor
+    await asyncio.to_thread(init_db)
+    _janitor = asyncio.create_task(_janitor_loop())
+
+
+async def stop_janitor():
+    global _janitor
+    if _janitor:
+        _janitor.cancel()
+        await asyncio.gather(_janitor, return_exceptions=True)
+        _janitor = None
@@ -0,0 +1,448 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config.settings import GLB_TEXTURE_MAX_SIZE, GLB_TEXTURE_QUALITY
+from utils.process_pool import run_in_process
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+DTYPE_COMPONENTS = {np.dtype(v): k for k, v in COMPONENT_DTYPES.items()}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+
+# Extensions whose data we would have to decode to rewrite the buffer safely
+UNSUPPORTED_EXTENSIONS = {"KHR_draco_mesh_compression", "EXT_meshopt_compression"}
+
+
+class GlbUnsupportedError(Exception):
+    """The file uses features the optimizer doesn't rewrite; ship the original."""
+
+
+def read_glb(mm: mmap.mmap) -> Tuple[dict, memoryview]:
+    """Split a memory-mapped GLB into its JSON document and a view of the BIN chunk."""
+    magic, version, length = struct.unpack_from("<4sII", mm, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise GlbUnsupportedError("Not a glTF 2.0 binary file")
+
+    offset = 12
+    document, binary = None, memoryview(b"")
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", mm, offset)
+        start = offset + 8
+        if chunk_type == CHUNK_JSON:
+            document = json.loads(mm[start:start + chunk_length])
+        elif chunk_type == CHUNK_BIN:
+            binary = memoryview(mm)[start:start + chunk_length]
+        offset = start + chunk_length
+
+    if document is None:
+        raise GlbUnsupportedError("GLB has no JSON chunk")
+    return document, binary
+
+
+def write_glb(path: str, document: dict, binary: bytes):
+    json_bytes = json.dumps(document, separators=(",", ":")).encode()
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+
+    length = 12 + 8 + len(json_bytes) + (8 + len(binary) if binary else 0)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", GLB_MAGIC, 2, length))
+        f.write(struct.pack("<II", len(json_bytes), CHUNK_JSON))
+        f.write(json_bytes)
+        if binary:
+            f.write(struct.pack("<II", len(binary), CHUNK_BIN))
+            f.write(binary)
+
+
+class _BufferWriter:
+    """Accumulates the new BIN chunk, sharing bufferViews with identical contents."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.views: List[dict] = []
+        self._seen: Dict[tuple, int] = {}
+
+    def add(self, payload: bytes, target: Optional[int] = None, stride: Optional[int] = None) -> int:
+        key = (hashlib.sha1(payload).digest(), len(payload), target, stride)
+        if key in self._seen:
+            return self._seen[key]
+
+        self.data += b"\0" * (-len(self.data) % 4)
+        view = {"buffer": 0, "byteOffset": len(self.data), "byteLength": len(payload)}
+        if target:
+            view["target"] = target
+        if stride:
+            view["byteStride"] = stride
+        self.data += payload
+        self.views.append(view)
+        self._seen[key] = len(self.views) - 1
+        return self._seen[key]
+
+
+def _read_accessor(document: dict, binary: memoryview, accessor: dict) -> np.ndarray:
+    if "sparse" in accessor:
+        raise GlbUnsupportedError("Sparse accessors are not supported")
+
+    dtype = np.dtype(COMPONENT_DTYPES[accessor["componentType"]])
+    components = TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+
+    if "bufferView" not in accessor:
+        return np.zeros((count, components), dtype=dtype)
+
+    view = document["bufferViews"][accessor["bufferView"]]
+    if view.get("buffer", 0) != 0:
+        raise GlbUnsupportedError("External buffers are not supported")
+
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride") or dtype.itemsize * components
+    strided = np.ndarray(
+        shape=(count, components),
+        dtype=dtype,
+        buffer=binary,
+        offset=offset,
+        strides=(stride, dtype.itemsize),
+    )
+    # Copy out so nothing keeps a reference into the mmap
+    return strided.copy()
+
+
+def _padded(values: np.ndarray, stride: int) -> bytes:
+    """Lay out rows at `stride` bytes each, as vertex attributes must be 4-byte aligned."""
+    row = values.dtype.itemsize * values.shape[1]
+    if row == stride:
+        return values.tobytes()
+    out = np.zeros((values.shape[0], stride), dtype=np.uint8)
+    out[:, :row] = values.view(np.uint8).reshape(values.shape[0], row)
+    return out.tobytes()
+
+
+def _quantize_normalized(values: np.ndarray, dtype) -> np.ndarray:
+    info = np.iinfo(dtype)
+    return np.round(np.clip(values, info.min / info.max if info.min else 0, 1) * info.max).astype(dtype)
+
+
+def _optimize_texture(data: bytes, mime: str) -> Tuple[bytes, str]:
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        resized = max(img.size) > GLB_TEXTURE_MAX_SIZE
+        if resized:
+            img.thumbnail((GLB_TEXTURE_MAX_SIZE, GLB_TEXTURE_MAX_SIZE), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        if has_alpha:
+            img.save(buffer, "PNG", optimize=True)
+            new_mime = "image/png"
+        else:
+            img.convert("RGB").save(buffer, "JPEG", quality=GLB_TEXTURE_QUALITY, optimize=True)
+            new_mime = "image/jpeg"
+
+    encoded = buffer.getvalue()
+    if not resized and len(encoded) >= len(data):
+        return data, mime
+    return encoded, new_mime
+
+
+class _Optimizer:
+    def __init__(self, document: dict, binary: memoryview):
+        self.src = document
+        self.binary = binary
+        self.doc = json.loads(json.dumps(document))
+        self.out = _BufferWriter()
+        self.accessors: List[dict] = []
+        self._accessor_keys: Dict[tuple, int] = {}
+        self._remapped: Dict[tuple, int] = {}
+        self.quantized = False
+
+    def run(self) -> Tuple[dict, bytes]:
+        doc = self.doc
+        used = set(doc.get("extensionsUsed", [])) | set(doc.get("extensionsRequired", []))
+        if used & UNSUPPORTED_EXTENSIONS:
+            raise GlbUnsupportedError(f"Compressed geometry ({', '.join(used & UNSUPPORTED_EXTENSIONS)})")
+        if any("uri" in b for b in doc.get("buffers", [])):
+            raise GlbUnsupportedError("External buffers are not supported")
+
+        self._optimize_meshes()
+        self._copy_other_accessors()
+        self._optimize_images()
+
+        doc["accessors"] = self.accessors
+        doc["bufferViews"] = self.out.views
+        doc["buffers"] = [{"byteLength": len(self.out.data)}] if self.out.data else []
+        for key in ("accessors", "bufferViews", "buffers", "images", "textures"):
+            if not doc.get(key):
+                doc.pop(key, None)
+
+        if self.quantized:
+            for key in ("extensionsUsed", "extensionsRequired"):
+                names = doc.setdefault(key, [])
+                if "KHR_mesh_quantization" not in names:
+                    names.append("KHR_mesh_quantization")
+
+        return doc, bytes(self.out.data)
+
+    # -- accessors -------------------------------------------------------
+
+    def _emit(self, values: np.ndarray, accessor_type: str, target: Optional[int] = None,
+              normalized: bool = False, stride: Optional[int] = None, bounds: bool = False,
+              template: Optional[dict] = None) -> int:
+        """Write an accessor, reusing an identical one written earlier."""
+        payload = _padded(values, stride) if stride else values.tobytes()
+        component = DTYPE_COMPONENTS[values.dtype]
+        key = (component, accessor_type, normalized, len(values), stride, hashlib.sha1(payload).digest())
+        if key in self._accessor_keys:
+            return self._accessor_keys[key]
+
+        accessor = {
+            "bufferView": self.out.add(payload, target, stride),
+            "componentType": component,
+            "count": int(len(values)),
+            "type": accessor_type,
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if template and "name" in template:
+            accessor["name"] = template["name"]
+        if bounds and len(values):
+            cast = float if values.dtype.kind == "f" else int
+            accessor["min"] = [cast(v) for v in values.min(axis=0)]
+            accessor["max"] = [cast(v) for v in values.max(axis=0)]
+        elif template:
+            for bound in ("min", "max"):
+                if bound in template:
+                    accessor[bound] = template[bound]
+
+        self.accessors.append(accessor)
+        self._accessor_keys[key] = len(self.accessors) - 1
+        return self._accessor_keys[key]
+
+    def _copy_accessor(self, index: int, target: Optional[int] = None) -> int:
+        key = ("copy", index, target)
+        if key not in self._remapped:
+            src = self.src["accessors"][index]
+            values = _read_accessor(self.src, self.binary, src)
+            stride = None
+            if target == ARRAY_BUFFER and values.dtype.itemsize * values.shape[1] % 4:
+                stride = values.dtype.itemsize * values.shape[1] + (-values.dtype.itemsize * values.shape[1] % 4)
+            self._remapped[key] = self._emit(
+                values, src["type"], target, src.get("normalized", False), stride, template=src
+            )
+        return self._remapped[key]
+
+    def _indices(self, index: int) -> int:
+        key = ("indices", index)
+        if key not in self._remapped:
+            src = self.src["accessors"][index]
+            values = _read_accessor(self.src, self.binary, src)
+            # 0xFFFF is reserved for primitive restart, so stay below it
+            if len(values) and values.max() < 0xFFFF:
+                values = values.astype(np.uint16)
+            self._remapped[key] = self._emit(values, "SCALAR", ELEMENT_ARRAY_BUFFER, template=src)
+        return self._remapped[key]
+
+    def _attribute(self, semantic: str, index: int, quantize: bool,
+                   position_transform: Optional[Tuple[np.ndarray, float]]) -> int:
+        src = self.src["accessors"][index]
+        if not quantize or src["componentType"] != 5126:
+            return self._copy_accessor(index, ARRAY_BUFFER)
+
+        key = (semantic, index, None if position_transform is None else
+               (tuple(position_transform[0]), position_transform[1]))
+        if key in self._remapped:
+            return self._remapped[key]
+
+        values = _read_accessor(self.src, self.binary, src)
+        if semantic == "POSITION" and position_transform is not None:
+            center, scale = position_transform
+            q = np.round((values - center) / scale).astype(np.int16)
+            result = self._emit(q, "VEC3", ARRAY_BUFFER, stride=8, bounds=True)
+        elif semantic == "NORMAL":
+            result = self._emit(_quantize_normalized(values, np.int8), "VEC3", ARRAY_BUFFER, True, stride=4)
+        elif semantic == "TANGENT":
+            result = self._emit(_quantize_normalized(values, np.int8), "VEC4", ARRAY_BUFFER, True)
+        elif semantic.startswith("TEXCOORD_") and len(values) and values.min() >= 0 and values.max() <= 1:
+            result = self._emit(_quantize_normalized(values, np.uint16), "VEC2", ARRAY_BUFFER, True)
+        else:
+            result = self._copy_accessor(index, ARRAY_BUFFER)
+            self._remapped[key] = result
+            return result
+
+        self.quantized = True
+        self._remapped[key] = result
+        return result
+
+    # -- meshes ----------------------------------------------------------
+
+    def _position_transform(self, mesh: dict) -> Optional[Tuple[np.ndarray, float]]:
+        """Center and uniform scale mapping the mesh's bounding box onto int16."""
+        lows, highs = [], []
+        for primitive in mesh["primitives"]:
+            index = primitive.get("attributes", {}).get("POSITION")
+            if index is None:
+                continue
+            accessor = self.src["accessors"][index]
+            if accessor["componentType"] != 5126:
+                return None
+            values = _read_accessor(self.src, self.binary, accessor)
+            if len(values):
+                lows.append(values.min(axis=0))
+                highs.append(values.max(axis=0))
+        if not lows:
+            return None
+
+        low, high = np.min(lows, axis=0), np.max(highs, axis=0)
+        center = ((low + high) / 2).astype(np.float64)
+        # Uniform scale keeps normals valid under the dequantizing node transform
+        extent = float(np.max(high - low) / 2) or 1.0
+        return center, extent / 32767
+
+    def _optimize_meshes(self):
+        doc = self.doc
+        nodes = doc.get("nodes", [])
+        skinned = {n["mesh"] for n in nodes if "mesh" in n and "skin" in n}
+        transforms: Dict[int, Tuple[np.ndarray, float]] = {}
+
+        for mesh_index, mesh in enumerate(doc.get("meshes", [])):
+            # Morph targets and skins share attribute layouts with other data; leave them as is
+            quantize = mesh_index not in skinned and not any("targets" in p for p in mesh["primitives"])
+            transform = self._position_transform(mesh) if quantize else None
+            if transform is not None:
+                transforms[mesh_index] = transform
+
+            for primitive in mesh["primitives"]:
+                primitive["attributes"] = {
+                    semantic: self._attribute(semantic, index, quantize, transform)
+                    for semantic, index in primitive.get("attributes", {}).items()
+                }
+                if "indices" in primitive:
+                    primitive["indices"] = self._indices(primitive["indices"])
+                for target in primitive.get("targets", []):
+                    for semantic, index in target.items():
+                        target[semantic] = self._copy_accessor(index, ARRAY_BUFFER)
+
+        # Quantized positions are dequantized by a child node carrying the
+        # inverse transform; the original node keeps its own transform and children.
+        for node in list(nodes):
+            mesh_index = node.get("mesh")
+            if mesh_index not in transforms:
+                continue
+            center, scale = transforms[mesh_index]
+            nodes.append({
+                "mesh": node.pop("mesh"),
+                "translation": [float(v) for v in center],
+                "scale": [scale, scale, scale],
+            })
+            node.setdefault("children", []).append(len(nodes) - 1)
+
+    def _copy_other_accessors(self):
+        doc = self.doc
+        for skin in doc.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                skin["inverseBindMatrices"] = self._copy_accessor(skin["inverseBindMatrices"])
+        for animation in doc.get("animations", []):
+            for sampler in animation.get("samplers", []):
+                sampler["input"] = self._copy_accessor(sampler["input"])
+                sampler["output"] = self._copy_accessor(sampler["output"])
+
+    # -- images ----------------------------------------------------------
+
+    def _optimize_images(self):
+        doc = self.doc
+        images = doc.get("images", [])
+        used = {t["source"] for t in doc.get("textures", []) if "source" in t}
+        for texture in doc.get("textures", []):
+            for ext in texture.get("extensions", {}).values():
+                if isinstance(ext, dict) and "source" in ext:
+                    used.add(ext["source"])
+
+        # Drop images no texture points at, then renumber texture sources
+        remap: Dict[int, int] = {}
+        kept = []
+        for index, image in enumerate(images):
+            if index in used:
+                remap[index] = len(kept)
+                kept.append(image)
+        for texture in doc.get("textures", []):
+            if "source" in texture:
+                texture["source"] = remap[texture["source"]]
+            for ext in texture.get("extensions", {}).values():
+                if isinstance(ext, dict) and "source" in ext:
+                    ext["source"] = remap[ext["source"]]
+
+        for image in kept:
+            if "bufferView" not in image:
+                continue
+            view = self.src["bufferViews"][image["bufferView"]]
+            start = view.get("byteOffset", 0)
+            data = bytes(self.binary[start:start + view["byteLength"]])
+            try:
+                data, image["mimeType"] = _optimize_texture(data, image.get("mimeType", "image/png"))
+            except Exception as e:
+                print(f"⚠️ Keeping texture {image.get('name', '')} as is: {e}")
+            image["bufferView"] = self.out.add(data)
+
+        doc["images"] = kept
+
+
+def optimize_glb(src_path: str, dst_path: str) -> dict:
+    """
+    Runs in a worker process. Writes a mobile-friendly copy of `src_path`:
+    identical data is stored once, indices shrink to 16 bit where possible,
+    vertex attributes are quantized (KHR_mesh_quantization), textures are
+    capped at GLB_TEXTURE_MAX_SIZE, and data nothing references is dropped.
+    """
+    started = time.perf_counter()
+    with open(src_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        document, binary = read_glb(mm)
+        try:
+            optimized, data = _Optimizer(document, binary).run()
+        finally:
+            binary.release()
+
+    write_glb(dst_path, optimized, data)
+    return {
+        "source": src_path,
+        "path": dst_path,
+        "original_bytes": os.path.getsize(src_path),
+        "optimized_bytes": os.path.getsize(dst_path),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def mobile_variant_path(path: str) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_mobile{ext}"
+
+
+async def optimize_for_mobile(path: str) -> dict:
+    """Build the "_mobile" GLB next to `path` on the process pool."""
+    stats = await run_in_process(optimize_glb, path, mobile_variant_path(path))
+    saved = 100 * (1 - stats["optimized_bytes"] / stats["original_bytes"])
+    print(
+        f"📉 Mobile GLB: {stats['original_bytes'] // 1024} KB → {stats['optimized_bytes'] // 1024} KB "
+        f"(-{saved:.0f}%) in {stats['seconds']}s"
+    )
+    return stats
@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import io
+import os
+from typing import List, Optional
+
+from PIL import ExifTags, Image, ImageFilter, ImageOps
+
+from config.settings import (
+    OUTPUT_THUMBNAIL,
+    IMAGE_MAX_EDGE,
+    IMAGE_FORMAT,
+    IMAGE_QUALITY,
+    THUMBNAIL_SIZE,
+    PLACEHOLDER_SIZE,
+)
+from utils.process_pool import run_in_process
+
+# Source formats Tripo3D accepts as-is, and the extension we write each as
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+TRIPO_FORMATS = set(EXTENSIONS)
+
+if IMAGE_FORMAT not in EXTENSIONS:
+    # Fail at startup rather than send Tripo a file whose name lies about its format
+    raise ValueError(f"IMAGE_FORMAT must be one of {', '.join(EXTENSIONS)}, not {IMAGE_FORMAT!r}")
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """Drop alpha onto a white background and normalise the colour mode to RGB."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buffer, fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def preprocess_image(path: str, out_path: str, thumbnail_path: Optional[str] = None) -> dict:
+    """
+    Runs in a worker process. Applies EXIF orientation, downscales to
+    IMAGE_MAX_EDGE and re-encodes as IMAGE_FORMAT into `out_path`. With `thumbnail_path`
+    also writes a THUMBNAIL_SIZE thumbnail and returns a tiny blurred
+    placeholder as a data URI.
+    """
+    original_bytes = os.path.getsize(path)
+
+    with Image.open(path) as source:
+        source_format = source.format
+        rotated = source.getexif().get(ExifTags.Base.Orientation, 1) != 1
+        img = _flatten(ImageOps.exif_transpose(source))
+
+    resized = max(img.size) > IMAGE_MAX_EDGE
+    if resized:
+        img.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+
+    data = _encode(img, IMAGE_FORMAT, IMAGE_QUALITY)
+
+    result = {"source": path, "original_bytes": original_bytes}
+
+    if source_format in TRIPO_FORMATS and not (rotated or resized) and len(data) >= original_bytes:
+        # Already compact, upright and accepted by Tripo; re-encoding would only cost quality
+        result.update(path=path, bytes=original_bytes)
+    else:
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(data)
+        result.update(path=out_path, bytes=len(data))
+
+    if thumbnail_path:
+        thumb = img.copy()
+        thumb.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        with open(thumbnail_path, "wb") as f:
+            f.write(_encode(thumb, "JPEG", 80))
+
+        tiny = img.copy()
+        tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+        tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+        encoded = base64.b64encode(_encode(tiny, "JPEG", 40)).decode()
+        result.update(thumbnail=thumbnail_path, placeholder=f"data:image/jpeg;base64,{encoded}")
+
+    return result
+
+
+async def preprocess_uploads(image_paths: List[str], thumbnail_name: Optional[str] = None) -> dict:
+    """
+    Preprocess every image in parallel on the process pool.
+    The thumbnail and placeholder come from the first image, which is the
+    one the client shows in its gallery.
+    """
+    if not image_paths:
+        return {"images": [], "thumbnail": None, "placeholder": None}
+
+    def stem(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def processed_path(i: int, path: str) -> str:
+        # Index prefix keeps IMG_1.png and IMG_1.jpeg in one request apart
+        return os.path.join(os.path.dirname(path), "processed", f"{i:02d}_{stem(path)}{EXTENSIONS[IMAGE_FORMAT]}")
+
+    thumbnail_path = os.path.join(OUTPUT_THUMBNAIL, thumbnail_name or f"thumb_{stem(image_paths[0])}.jpg")
+
+    results = await asyncio.gather(*(
+        run_in_process(preprocess_image, path, processed_path(i, path), thumbnail_path if i == 0 else None)
+        for i, path in enumerate(image_paths)
+    ))
+
+    before = sum(r["original_bytes"] for r in results)
+    after = sum(r["bytes"] for r in results)
+    print(f"🗜️ Preprocessed {len(results)} images: {before // 1024} KB → {after // 1024} KB")
+
+    return {
+        "images": [r["path"] for r in results],
+        "thumbnail": results[0]["thumbnail"],
+        "placeholder": results[0]["placeholder"],
+    }
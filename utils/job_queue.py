@@ -0,0 +1,116 @@
+import asyncio
+import os
+import uuid
+from typing import List, Optional
+
+from config.settings import JOB_WORKERS, JOB_MAX_QUEUE, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS
+from utils import job_store, metrics
+from utils.pipeline import run_pipeline
+from utils.workspace import remove_workspace
+
+# Identifies this process in the job table so stale leases can be told apart.
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+
+async def submit_job(job_id: str, saved_files: List[str], cache_key: Optional[str] = None) -> dict:
+    """
+    Queue a job for files already persisted on disk.
+    Returns the existing job instead when one is already running for `cache_key`.
+    Raises job_store.QueueFullError when the queue is at JOB_MAX_QUEUE.
+    """
+    job = await asyncio.to_thread(job_store.create_job, job_id, saved_files, JOB_MAX_QUEUE, cache_key)
+    if _wakeup:
+        _wakeup.set()
+    return job
+
+
+async def _heartbeat(job_id: str):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(job_store.heartbeat, job_id)
+        except Exception as e:
+            # A missed beat only risks the lease; the next one may well succeed
+            print(f"⚠️ Heartbeat for job {job_id} failed:", e)
+
+
+async def _finish(job_id: str, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+    try:
+        await asyncio.to_thread(job_store.finish_job, job_id, result, error)
+        return True
+    except Exception as e:
+        # The job keeps its active stage, so another worker retries it once the lease lapses
+        print(f"⚠️ Could not record the outcome of job {job_id}:", e)
+        return False
+
+
+async def _run_job(job: dict):
+    job_id = job["job_id"]
+
+    async def on_stage(stage: str):
+        await asyncio.to_thread(job_store.set_stage, job_id, stage)
+
+    print(f"🛠️ Worker {WORKER_ID} picked up job {job_id}")
+    # Each worker loop is its own task, so this only tags this job's work
+    metrics.correlation_id.set(job_id)
+    metrics.trace("job_claimed", worker=WORKER_ID, attempt=job["attempts"])
+    beat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        result = await run_pipeline(job["files"], on_stage=on_stage, cache_key=job["cache_key"])
+        if result.get("status") == "success":
+            finished = await _finish(job_id, result)
+        else:
+            error = result.get("message") or result.get("details") or "Generation failed"
+            finished = await _finish(job_id, result, error)
+    except Exception as e:
+        print(f"⚠️ Job {job_id} failed:", e)
+        finished = await _finish(job_id, None, str(e))
+    finally:
+        beat.cancel()
+
+    # Inputs are only kept while the job can still be retried
+    if finished and job["files"]:
+        await remove_workspace(os.path.dirname(job["files"][0]))
+
+
+async def _wait_for_work():
+    # Jobs queued by other processes are only seen by polling, so
+    # sleep at most JOB_POLL_INTERVAL even without a local wakeup.
+    _wakeup.clear()
+    try:
+        await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _worker_loop():
+    while True:
+        try:
+            job = await asyncio.to_thread(job_store.claim_next_job, WORKER_ID)
+            if job is None:
+                await _wait_for_work()
+                continue
+            await _run_job(job)
+        except Exception as e:
+            # e.g. "database is locked" or a full disk; losing the worker would strand every queued job
+            print(f"⚠️ Job worker {WORKER_ID} error, retrying in {JOB_POLL_INTERVAL}s:", e)
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+async def start_workers():
+    global _wakeup
+    await asyncio.to_thread(job_store.init_db)
+    _wakeup = asyncio.Event()
+    for _ in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop()))
+    print(f"👷 Started {JOB_WORKERS} job workers ({WORKER_ID})")
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
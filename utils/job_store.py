@@ -0,0 +1,183 @@
+import json
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from config.settings import JOB_DB_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+from utils.sqlite_db import connect
+
+# Stages a job moves through. "done" and "failed" are terminal.
+QUEUED = "queued"
+ACTIVE_STAGES = ("preprocessing", "generating", "converting", "uploading")
+DONE = "done"
+FAILED = "failed"
+TERMINAL_STAGES = (DONE, FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its configured depth limit."""
+
+
+def _connect():
+    return connect(JOB_DB_PATH)
+
+
+def init_db():
+    with _connect() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                files TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker_id TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_stage_created ON jobs (stage, created_at)")
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "cache_key" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key)")
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    return {
+        "job_id": row["id"],
+        "stage": row["stage"],
+        "files": json.loads(row["files"]),
+        "cache_key": row["cache_key"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def create_job(job_id: str, files: List[str], max_queued: int, cache_key: Optional[str] = None) -> dict:
+    """
+    Insert a queued job, refusing with QueueFullError when `max_queued`
+    jobs are already waiting. The check and the insert share one write
+    transaction so concurrent workers can't overshoot the limit.
+
+    If an unfinished job already exists for `cache_key`, that job is
+    returned instead so identical submissions share one generation.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if cache_key:
+            existing = conn.execute(
+                f"SELECT * FROM jobs WHERE cache_key = ? AND stage NOT IN ({','.join('?' for _ in TERMINAL_STAGES)})",
+                (cache_key, *TERMINAL_STAGES),
+            ).fetchone()
+            if existing:
+                conn.execute("COMMIT")
+                return _row_to_job(existing)
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE stage = ?", (QUEUED,)).fetchone()[0]
+        if queued >= max_queued:
+            conn.execute("ROLLBACK")
+            raise QueueFullError(f"{queued} jobs already queued")
+        conn.execute(
+            "INSERT INTO jobs (id, stage, files, cache_key, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(files), cache_key, now, now),
+        )
+        conn.execute("COMMIT")
+    return get_job(job_id)
+
+
+def create_finished_job(job_id: str, result: dict, cache_key: Optional[str] = None) -> dict:
+    """Insert a job that is already done, for results served from the cache."""
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO jobs (id, stage, files, result, cache_key, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, DONE, json.dumps([]), json.dumps(result), cache_key, now, now),
+        )
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def claim_next_job(worker_id: str) -> Optional[dict]:
+    """
+    Atomically take the oldest runnable job: either queued, or active on a
+    worker that stopped heartbeating (crashed process, restart mid-job).
+    Jobs that already used up their attempts are marked failed instead.
+    """
+    now = time.time()
+    stale_before = now - JOB_LEASE_SECONDS
+    placeholders = ",".join("?" for _ in ACTIVE_STAGES)
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            f"""
+            UPDATE jobs SET stage = ?, error = ?, updated_at = ?
+            WHERE stage IN ({placeholders}) AND updated_at < ? AND attempts >= ?
+            """,
+            (FAILED, "Worker lost while processing job", now, *ACTIVE_STAGES, stale_before, JOB_MAX_ATTEMPTS),
+        )
+        row = conn.execute(
+            f"""
+            SELECT id FROM jobs
+            WHERE stage = ? OR (stage IN ({placeholders}) AND updated_at < ?)
+            ORDER BY created_at
+            LIMIT 1
+            """,
+            (QUEUED, *ACTIVE_STAGES, stale_before),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            """
+            UPDATE jobs SET stage = ?, worker_id = ?, attempts = attempts + 1, updated_at = ?
+            WHERE id = ?
+            """,
+            (ACTIVE_STAGES[0], worker_id, now, row["id"]),
+        )
+        conn.execute("COMMIT")
+    return get_job(row["id"])
+
+
+def set_stage(job_id: str, stage: str):
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id))
+
+
+def heartbeat(job_id: str):
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+
+def finish_job(job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+    stage = FAILED if error else DONE
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET stage = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (stage, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+        )
+
+
+def count_by_stage() -> Dict[str, int]:
+    with _connect() as conn:
+        rows = conn.execute("SELECT stage, COUNT(*) AS n FROM jobs GROUP BY stage").fetchall()
+    return {row["stage"]: row["n"] for row in rows}
@@ -0,0 +1,203 @@
+import asyncio
+import bisect
+import json
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import TRACE_LOGS, EVENT_LOOP_LAG_INTERVAL
+
+try:
+    import resource
+except ImportError:
+    # Unix only; Windows goes without the peak RSS gauge
+    resource = None
+
+# Seconds; generation stages run from tens of milliseconds up to several minutes
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+# Seconds a scheduled wakeup ran late; anything over ~50ms is felt by every request
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+# Actual remaining time divided by Tripo's running_left_time estimate
+RATIO_BUCKETS = (0.25, 0.5, 0.75, 0.9, 1.1, 1.25, 1.5, 2, 3, 5, 10)
+
+# Job id of the request or job being worked on; copied into every task it spawns
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_registry: List["_Metric"] = []
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """A settable value, or one read from `callback` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        self._values[_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            self._values[()] = self.callback()
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = buckets
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                le = 'le="%s"' % (bound if bound == "+Inf" else _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def trace(event: str, **fields):
+    """One JSON line per pipeline event, tagged with the current correlation id."""
+    if not TRACE_LOGS:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, "correlation_id": correlation_id.get(), **fields}
+    print(json.dumps(record, default=str), flush=True)
+
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Time spent in each pipeline stage.")
+STAGE_ERRORS = Counter("pipeline_stage_errors_total", "Failures by pipeline stage and format.")
+IN_FLIGHT = Gauge("pipeline_in_flight", "Generations currently running in this process.")
+RESULTS = Counter("pipeline_results_total", "Finished pipeline runs by status and cache outcome.")
+TRANSFER_BYTES = Counter("transfer_bytes_total", "Bytes moved to or from clients, Tripo and Supabase.")
+UPLOAD_RETRIES = Counter("supabase_upload_retries_total", "Supabase upload attempts retried after a transient error.")
+JOBS = Gauge("jobs", "Jobs in the shared job store by stage.")
+TRIPO_POLLS = Counter("tripo_polls_total", "Task status requests made by the poller.")
+TRIPO_ETA_RATIO = Histogram(
+    "tripo_eta_ratio",
+    "Actual time to finish divided by the first running_left_time Tripo reported.",
+    RATIO_BUCKETS,
+)
+
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop ran a scheduled wakeup.", LAG_BUCKETS)
+if resource is not None:
+    # ru_maxrss is bytes on macOS and KiB on Linux and the BSDs
+    _RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+    PEAK_RSS = Gauge("process_peak_rss_bytes", "Peak resident memory of this process.",
+                     lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT)
+
+
+async def monitor_event_loop(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """Sleep `interval` at a time and record how much later than that we woke up."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+@contextmanager
+def timed(stage: str, format: str = ""):
+    """
+    Record how long the block took under `stage` (and `format`), count it as
+    an error if it raises, and emit a trace line either way.
+    Cancellation is timed but not counted as an error.
+    """
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = "error"
+        STAGE_ERRORS.inc(stage=stage, format=format)
+        trace("stage_error", stage=stage, format=format, error=str(e))
+        raise
+    except BaseException:
+        outcome = "cancelled"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage, format=format)
+        trace("stage", stage=stage, format=format, seconds=round(seconds, 3), outcome=outcome)
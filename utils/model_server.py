@@ -0,0 +1,221 @@
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import brotli
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response
+
+from config.settings import (
+    OUTPUT_DIR,
+    SERVE_CACHE_BYTES,
+    SERVE_CACHE_MAX_FILE,
+    SERVE_ETAG_CACHE_SIZE,
+    SERVE_IMMUTABLE_MAX_AGE,
+    SERVE_DEFAULT_MAX_AGE,
+    BROTLI_QUALITY,
+)
+from utils.disk_janitor import note_access
+from utils.process_pool import run_in_process
+
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("model/vnd.usdz+zip", ".usdz")
+
+# Only GLB benefits; USDZ is a zip and images are already compressed
+PRECOMPRESS_EXTENSIONS = {".glb"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Task ids (UUIDs) or long hex digests in a name mean the bytes never change
+CONTENT_HASHED = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,}", re.I)
+
+# (path, size, mtime_ns) -> strong ETag, least recently used first
+_etags: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_background: Set[asyncio.Task] = set()
+
+
+class _LRUCache:
+    """Byte-budgeted LRU of small file bodies, keyed by path + stat."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        body = self._items.get(key)
+        if body is not None:
+            self._items.move_to_end(key)
+        return body
+
+    def put(self, key: tuple, body: bytes):
+        if key in self._items:
+            return
+        self._items[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+_hot_files = _LRUCache(SERVE_CACHE_BYTES)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+async def _etag(path: str, stat: os.stat_result) -> str:
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    etag = _etags.get(key)
+    if etag is not None:
+        _etags.move_to_end(key)
+        return etag
+    etag = _etags[key] = f'"{await asyncio.to_thread(_hash_file, path)}"'
+    # Replaced and evicted files leave stale keys behind; drop the oldest
+    while len(_etags) > SERVE_ETAG_CACHE_SIZE:
+        _etags.popitem(last=False)
+    return etag
+
+
+def _accepted_encodings(header: str) -> Set[str]:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def _resolve(relative_path: str) -> Optional[str]:
+    root = os.path.realpath(OUTPUT_DIR)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def precompress(path: str) -> Dict[str, int]:
+    """
+    Write `path`.gz and `path`.br next to the file (worker process).
+    Variants that don't save at least 10% are not kept.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    written = {}
+    for encoding, suffix in ENCODINGS:
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) > len(data) * 0.9:
+            continue
+        tmp = f"{path}{suffix}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp, path + suffix)
+        written[encoding] = len(compressed)
+    return written
+
+
+def schedule_precompress(path: str):
+    """Build compressed variants in the background; serving falls back to identity until they exist."""
+    if os.path.splitext(path)[1].lower() not in PRECOMPRESS_EXTENSIONS:
+        return
+
+    async def run():
+        try:
+            written = await run_in_process(precompress, path)
+            if written:
+                print(f"🗜️ Precompressed {os.path.basename(path)}: {written}")
+        except Exception as e:
+            print(f"⚠️ Precompression failed for {path}: {e}")
+
+    task = asyncio.create_task(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def serve_output_file(request: Request, relative_path: str) -> Response:
+    """
+    Serve a file from OUTPUT_DIR with strong ETags (304 on If-None-Match),
+    byte ranges (via FileResponse), precompressed br/gzip variants and an
+    in-memory LRU for small hot files such as thumbnails.
+    """
+    path = _resolve(relative_path)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+
+    stat = os.stat(path)
+    note_access(path)
+    etag = await _etag(path, stat)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    max_age = SERVE_IMMUTABLE_MAX_AGE if CONTENT_HASHED.search(os.path.basename(path)) else SERVE_DEFAULT_MAX_AGE
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}" + (", immutable" if max_age == SERVE_IMMUTABLE_MAX_AGE else ""),
+    }
+    compressible = os.path.splitext(path)[1].lower() in PRECOMPRESS_EXTENSIONS
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+
+    # Pick a precompressed representation, except for range requests,
+    # which resume the identity bytes
+    serve_path, serve_stat = path, stat
+    if compressible and "range" not in request.headers:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+                serve_path, serve_stat = path + suffix, variant_stat
+                headers["Content-Encoding"] = encoding
+                # Each representation needs its own strong validator
+                etag = f'{etag[:-1]}-{encoding}"'
+                break
+    headers["ETag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if serve_stat.st_size <= SERVE_CACHE_MAX_FILE and "range" not in request.headers:
+        key = (serve_path, serve_stat.st_size, serve_stat.st_mtime_ns)
+        body = _hot_files.get(key)
+        if body is None:
+            body = await asyncio.to_thread(_read_file, serve_path)
+            _hot_files.put(key, body)
+        headers["Accept-Ranges"] = "bytes"
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=media_type)
+        return Response(content=body, headers=headers, media_type=media_type)
+
+    # FileResponse streams from disk and handles Range/If-Range/416 itself;
+    # it keeps our ETag since it only sets one if missing.
+    return FileResponse(serve_path, stat_result=serve_stat, headers=headers, media_type=media_type)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import shutil
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from config.settings import OUTPUT_GLB, OUTPUT_USDZ, GLB_OPTIMIZE, OUTPUT_FORMATS
+from utils import disk_janitor, metrics, result_cache
+from utils.glb_optimizer import GlbUnsupportedError, optimize_for_mobile
+from utils.image_preprocess import preprocess_uploads
+from utils.model_server import schedule_precompress
+from utils.tripo_sdk_client import generate_3d_from_images
+from utils.supabase_client import upload_to_supabase_async
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+DEFAULT_FORMATS = OUTPUT_FORMATS
+
+
+async def pipeline_cache_key(saved_files: List[str], formats: List[str] = DEFAULT_FORMATS) -> str:
+    return await asyncio.to_thread(result_cache.cache_key, saved_files, formats)
+
+
+async def run_pipeline(
+    saved_files: List[str],
+    on_stage: Optional[StageCallback] = None,
+    formats: List[str] = DEFAULT_FORMATS,
+    cache_key: Optional[str] = None,
+) -> dict:
+    """
+    Generate a model from already-saved images and upload the results to Supabase.
+    `on_stage` is awaited with "preprocessing", "generating", "converting" and "uploading"
+    as work progresses.
+    Identical image sets are answered from the result cache instead of re-generating.
+    """
+    if cache_key is None:
+        cache_key = await pipeline_cache_key(saved_files, formats)
+
+    generated = False
+
+    async def generate():
+        nonlocal generated
+        generated = True
+        metrics.IN_FLIGHT.inc()
+        try:
+            with metrics.timed("total"):
+                return await _generate_and_upload(saved_files, formats, on_stage, cache_key)
+        finally:
+            metrics.IN_FLIGHT.dec()
+
+    result = await result_cache.get_or_generate(cache_key, generate)
+    metrics.RESULTS.inc(status=result.get("status"), cache="miss" if generated else "hit")
+    metrics.trace("pipeline_result", status=result.get("status"), cached=not generated, errors=list(result.get("errors", {})))
+    if result.get("status") == "success":
+        # Lets clients invalidate the entry via DELETE /cache/{key}
+        result = {**result, "cache_key": cache_key}
+    return result
+
+
+async def _generate_and_upload(
+    saved_files: List[str], formats: List[str], on_stage: Optional[StageCallback], cache_key: str
+) -> dict:
+    async def stage(name: str):
+        if on_stage:
+            await on_stage(name)
+
+    bucket = os.getenv("SUPABASE_BUCKET")
+    uploads: List[Tuple[str, asyncio.Task]] = []
+
+    async def upload(kind: str, filepath: str, folder: str):
+        filename = os.path.basename(filepath)
+        dest = f"models/{folder}/{int(time.time())}_{filename}"
+        with metrics.timed("upload", format=kind):
+            url = await upload_to_supabase_async(filepath, dest, bucket)
+        # Safely in Supabase now, so the janitor may evict the local copy
+        await asyncio.to_thread(disk_janitor.mark_uploaded, filepath)
+        return url
+
+    def start_upload(kind: str, filepath: str, folder: str):
+        print(f"⬆️ Uploading {kind}: {os.path.basename(filepath)}")
+        uploads.append((kind, asyncio.create_task(upload(kind, filepath, folder))))
+
+    optimizations = []
+
+    async def optimize_and_upload(filepath: str):
+        try:
+            with metrics.timed("optimize", format="glb_mobile"):
+                stats = await optimize_for_mobile(filepath)
+        except GlbUnsupportedError as e:
+            print(f"ℹ️ Skipping mobile GLB for {os.path.basename(filepath)}: {e}")
+            return None
+        except Exception as e:
+            # The mobile variant is optional; a bug in the rewriter mustn't fail the request
+            print(f"⚠️ Mobile GLB optimization failed for {os.path.basename(filepath)}: {e}")
+            return None
+        optimizations.append(stats)
+        schedule_precompress(stats["path"])
+        return await upload("glb_mobile", stats["path"], "glb")
+
+    def start_thumbnail_upload():
+        # Thumbnail goes up alongside the first model artifact,
+        # so a failed generation doesn't leave an orphan behind.
+        if thumbnail and not any(kind == "thumbnail" for kind, _ in uploads):
+            start_upload("thumbnail", thumbnail, "thumbnails")
+
+    async def on_artifact(fmt: str, path: str):
+        # Move each file into place and start its upload the moment it lands
+        if fmt == "glb":
+            new_path = os.path.join(OUTPUT_GLB, os.path.basename(path))
+        elif fmt == "usdz":
+            new_path = os.path.join(OUTPUT_USDZ, os.path.basename(path))
+        else:
+            new_path = path
+        if new_path != path:
+            await asyncio.to_thread(shutil.move, path, new_path)
+        start_thumbnail_upload()
+        start_upload(fmt, new_path, fmt)
+        schedule_precompress(new_path)
+        if fmt == "glb" and GLB_OPTIMIZE:
+            # Worker-process optimisation runs alongside the original's upload
+            uploads.append(("glb_mobile", asyncio.create_task(optimize_and_upload(new_path))))
+
+    print(f"📸 Received {len(saved_files)} images. Generating model...")
+    metrics.trace("pipeline_start", images=len(saved_files), formats=formats, cache_key=cache_key)
+
+    # Downscale/re-encode before sending to Tripo and build a real thumbnail
+    await stage("preprocessing")
+    try:
+        # Content-addressed name: no clashes between users' IMG_0001.jpeg
+        with metrics.timed("preprocessing"):
+            prepared = await preprocess_uploads(saved_files, thumbnail_name=f"thumb_{cache_key[:16]}.jpg")
+        images, thumbnail, placeholder = prepared["images"], prepared["thumbnail"], prepared["placeholder"]
+    except Exception as e:
+        print("⚠️ Preprocessing failed, using original images:", e)
+        images, thumbnail, placeholder = saved_files, saved_files[0] if saved_files else None, None
+
+    # Generate GLB + USDZ
+    await stage("generating")
+    try:
+        result = await generate_3d_from_images(
+            images, formats=formats, on_stage=on_stage, on_artifact=on_artifact
+        )
+    except BaseException:
+        for _, task in uploads:
+            task.cancel()
+        raise
+
+    if result.get("status") != "success":
+        for _, task in uploads:
+            task.cancel()
+        return result
+
+    # The thumbnail upload was started by on_artifact with the first model file
+    await stage("uploading")
+
+    supabase_urls = {fmt: [] for fmt in formats}
+    supabase_urls["thumbnail"] = None
+    supabase_urls["placeholder"] = placeholder
+    errors = dict(result.get("errors", {}))
+
+    outcomes = await asyncio.gather(*(task for _, task in uploads), return_exceptions=True)
+    for (kind, _), outcome in zip(uploads, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Upload error for {kind.upper()}: {outcome}")
+            errors[f"upload_{kind}"] = str(outcome)
+        elif kind == "thumbnail":
+            supabase_urls["thumbnail"] = outcome
+        elif outcome is None:
+            continue
+        else:
+            supabase_urls.setdefault(kind, []).append(outcome)
+
+    print("🚀 Upload complete:", supabase_urls)
+
+    response = {
+        "status": "success",
+        "message": "Models generated & uploaded",
+        "file_urls": supabase_urls
+    }
+    if optimizations:
+        response["optimization"] = [
+            {k: stats[k] for k in ("original_bytes", "optimized_bytes", "seconds")} for stats in optimizations
+        ]
+    if errors:
+        response["errors"] = errors
+    return response
@@ -0,0 +1,54 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Optional
+
+from config.settings import PROCESS_POOL_WORKERS
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the parent runs an event loop and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def run_in_process(fn, *args, **kwargs):
+    """
+    Run a picklable, CPU-bound function in the shared worker pool.
+    If a worker died (e.g. OOM on a huge image) the pool is replaced and the
+    call retried once, so one crash doesn't break every later call.
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(fn, *args, **kwargs)
+    pool = get_process_pool()
+    try:
+        return await loop.run_in_executor(pool, call)
+    except BrokenProcessPool:
+        print("⚠️ Process pool broke (a worker died); starting a new one")
+        _discard_pool(pool)
+        return await loop.run_in_executor(get_process_pool(), call)
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    # Concurrent callers may have replaced it already
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        # Wait so workers get their exit sentinel; returning early orphans them when the server exits
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
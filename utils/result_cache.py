@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config.settings import CACHE_DB_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES
+from utils.sqlite_db import connect
+
+# Futures for generations currently running in this process, by cache key.
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _connect():
+    return connect(CACHE_DB_PATH)
+
+
+def init_db():
+    with _connect() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used_at)")
+
+
+def cache_key(image_paths: List[str], formats: List[str]) -> str:
+    """
+    Hash the images' bytes in order, plus the requested formats.
+    File names are ignored so the same photo uploaded under a new name still hits.
+    """
+    digest = hashlib.sha256()
+    for path in image_paths:
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+        digest.update(file_hash.digest())
+    digest.update(json.dumps(sorted(set(formats))).encode())
+    return digest.hexdigest()
+
+
+def lookup(key: str) -> Optional[dict]:
+    now = time.time()
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT result FROM results WHERE key = ? AND created_at >= ?",
+            (key, now - CACHE_TTL_SECONDS),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE results SET hits = hits + 1, last_used_at = ? WHERE key = ?", (now, key))
+    return json.loads(row["result"])
+
+
+def store(key: str, result: dict):
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO results (key, result, hits, created_at, last_used_at)
+            VALUES (?, ?, 0, ?, ?)
+            """,
+            (key, json.dumps(result), now, now),
+        )
+    evict()
+
+
+def evict() -> int:
+    """Drop expired entries, then the least recently used beyond CACHE_MAX_ENTRIES."""
+    with _connect() as conn:
+        expired = conn.execute(
+            "DELETE FROM results WHERE created_at < ?", (time.time() - CACHE_TTL_SECONDS,)
+        ).rowcount
+        overflow = conn.execute(
+            """
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM results ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (CACHE_MAX_ENTRIES,),
+        ).rowcount
+    return expired + overflow
+
+
+def invalidate(key: str) -> bool:
+    with _connect() as conn:
+        return conn.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount > 0
+
+
+def clear() -> int:
+    with _connect() as conn:
+        return conn.execute("DELETE FROM results").rowcount
+
+
+async def get_or_generate(key: str, generate: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Return the cached result for `key`, or run `generate` to produce it.
+    Concurrent callers with the same key share a single `generate` call.
+    Only fully successful results (no per-format errors) are cached.
+    """
+    if key not in _inflight:
+        cached = await asyncio.to_thread(lookup, key)
+        if cached is not None:
+            print(f"♻️ Cache hit {key[:12]}")
+            return {**cached, "cached": True}
+
+    # Checked after the lookup too, since another request may have started meanwhile
+    if key in _inflight:
+        print(f"🔗 Joining in-flight generation {key[:12]}")
+        return await asyncio.shield(_inflight[key])
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await generate()
+        if result.get("status") == "success" and not result.get("errors"):
+            await asyncio.to_thread(store, key, result)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark retrieved so a failure nobody else awaited isn't logged as unhandled
+        future.exception()
+        raise
+    finally:
+        del _inflight[key]
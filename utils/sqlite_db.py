@@ -0,0 +1,19 @@
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def connect(path: str):
+    """
+    A short-lived connection per call, which keeps the stores safe to use from
+    threads and from several uvicorn worker processes sharing the same file.
+    Autocommit unless the caller issues BEGIN; WAL lets readers run alongside a writer.
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+    finally:
+        conn.close()
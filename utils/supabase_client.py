@@ -1,15 +1,57 @@
+import asyncio
+import base64
+import mimetypes
 import os
+import random
+from typing import Optional
+
+import aiofiles
+import aiohttp
 from supabase import create_client, Client
 
+from utils import metrics
+from config.settings import (
+    SUPABASE_UPLOAD_CONCURRENCY,
+    SUPABASE_UPLOAD_RETRIES,
+    SUPABASE_UPLOAD_TIMEOUT,
+    SUPABASE_RESUMABLE_THRESHOLD,
+    SUPABASE_CHUNK_SIZE,
+)
+
 # Load environment variables
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise Exception("❌ Missing SUPABASE_URL or SUPABASE_KEY")
+_supabase: Optional[Client] = None
+
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("model/vnd.usdz+zip", ".usdz")
+
+# Status codes worth retrying: rate limiting and server-side hiccups
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_session: Optional[aiohttp.ClientSession] = None
+_upload_slots = asyncio.Semaphore(SUPABASE_UPLOAD_CONCURRENCY)
+
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+class UploadError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"❌ Upload failed ({status}): {message}")
+        self.status = status
+
+
+def get_supabase() -> Client:
+    """
+    Created on first use rather than at import, so the app (and tools that
+    import it, like the benchmarks) can start without credentials.
+    """
+    global _supabase
+    if _supabase is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise Exception("❌ Missing SUPABASE_URL or SUPABASE_KEY")
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
 
 
 def upload_to_supabase(local_path: str, dest_path: str, bucket: str = None) -> str:
@@ -30,13 +72,149 @@ def upload_to_supabase(local_path: str, dest_path: str, bucket: str = None) -> s
         file_bytes = file_obj.read()
 
     # Upload file
-    response = supabase.storage.from_(bucket).upload(dest_path, file_bytes)
+    response = get_supabase().storage.from_(bucket).upload(dest_path, file_bytes)
 
     # Check Supabase response
     if isinstance(response, dict) and response.get("error"):
         raise Exception(f"❌ Upload failed: {response['error']['message']}")
 
     # Get public URL
-    public_url = supabase.storage.from_(bucket).get_public_url(dest_path)
+    public_url = get_supabase().storage.from_(bucket).get_public_url(dest_path)
 
     return public_url
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Shared keep-alive session, created on first use in the running loop."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=SUPABASE_UPLOAD_CONCURRENCY * 2, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=SUPABASE_UPLOAD_TIMEOUT),
+            headers={"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY},
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def _file_chunks(local_path: str, offset: int = 0, length: Optional[int] = None, chunk_size: int = 256 * 1024):
+    """Stream a byte range of a file from disk without loading it into memory."""
+    remaining = length
+    async with aiofiles.open(local_path, "rb") as f:
+        await f.seek(offset)
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = await f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+async def _raise_for_status(response: aiohttp.ClientResponse):
+    if response.status >= 400:
+        raise UploadError(response.status, await response.text())
+
+
+async def _standard_upload(local_path: str, dest_path: str, bucket: str, content_type: str, size: int):
+    url = f"{SUPABASE_URL}/storage/v1/object/{bucket}/{dest_path}"
+    # Upsert so a retry after a lost response doesn't fail as a duplicate
+    headers = {"Content-Type": content_type, "Content-Length": str(size), "x-upsert": "true"}
+    async with _get_session().post(url, data=_file_chunks(local_path), headers=headers) as response:
+        await _raise_for_status(response)
+
+
+async def _resumable_upload(local_path: str, dest_path: str, bucket: str, content_type: str, size: int):
+    """
+    TUS upload in SUPABASE_CHUNK_SIZE pieces. Each attempt asks the server
+    for its current offset first, so a retry only resends the missing tail.
+    """
+    session = _get_session()
+    metadata = {
+        "bucketName": bucket,
+        "objectName": dest_path,
+        "contentType": content_type,
+    }
+    encoded = ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items())
+    tus = {"Tus-Resumable": "1.0.0"}
+
+    async def create():
+        async with session.post(
+            f"{SUPABASE_URL}/storage/v1/upload/resumable",
+            headers={**tus, "Upload-Length": str(size), "Upload-Metadata": encoded, "x-upsert": "true"},
+        ) as response:
+            await _raise_for_status(response)
+            return response.headers["Location"]
+
+    location = await _with_retries(create, dest_path)
+
+    async def upload_remaining():
+        async with session.head(location, headers=tus) as response:
+            await _raise_for_status(response)
+            offset = int(response.headers.get("Upload-Offset", "0"))
+
+        while offset < size:
+            length = min(SUPABASE_CHUNK_SIZE, size - offset)
+            headers = {
+                **tus,
+                "Upload-Offset": str(offset),
+                "Content-Type": "application/offset+octet-stream",
+                "Content-Length": str(length),
+            }
+            async with session.patch(location, data=_file_chunks(local_path, offset, length), headers=headers) as response:
+                await _raise_for_status(response)
+                offset = int(response.headers.get("Upload-Offset", offset + length))
+
+    await _with_retries(upload_remaining, dest_path)
+
+
+async def _with_retries(attempt, label: str):
+    """Retry transient failures with exponential backoff and jitter."""
+    for n in range(SUPABASE_UPLOAD_RETRIES + 1):
+        try:
+            return await attempt()
+        except (aiohttp.ClientError, asyncio.TimeoutError, UploadError) as e:
+            transient = not isinstance(e, UploadError) or e.status in RETRYABLE_STATUSES
+            if not transient or n == SUPABASE_UPLOAD_RETRIES:
+                raise
+            delay = min(30, 2 ** n) * (0.5 + random.random())
+            print(f"🔁 Retrying upload of {label} in {delay:.1f}s: {e}")
+            metrics.UPLOAD_RETRIES.inc()
+            await asyncio.sleep(delay)
+
+
+async def upload_to_supabase_async(local_path: str, dest_path: str, bucket: str = None) -> str:
+    """
+    Non-blocking counterpart of upload_to_supabase: streams the file from disk
+    over a shared keep-alive session and returns the same public URL.
+    """
+    bucket = bucket or SUPABASE_BUCKET
+
+    if not bucket:
+        raise Exception("❌ No bucket name provided")
+
+    if not os.path.exists(local_path):
+        raise FileNotFoundError(f"❌ File not found: {local_path}")
+
+    client = get_supabase()
+    size = os.path.getsize(local_path)
+    content_type = mimetypes.guess_type(local_path)[0] or "application/octet-stream"
+
+    async with _upload_slots:
+        if size >= SUPABASE_RESUMABLE_THRESHOLD:
+            await _resumable_upload(local_path, dest_path, bucket, content_type, size)
+        else:
+            await _with_retries(
+                lambda: _standard_upload(local_path, dest_path, bucket, content_type, size), dest_path
+            )
+    metrics.TRANSFER_BYTES.inc(size, peer="supabase", direction="out")
+
+    # Get public URL
+    return client.storage.from_(bucket).get_public_url(dest_path)
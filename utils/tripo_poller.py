@@ -0,0 +1,189 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from tripo3d import TripoClient, TaskStatus
+from tripo3d.models import Task
+
+from config.settings import (
+    TRIPO_POLL_INTERVAL,
+    TRIPO_POLL_MAX_INTERVAL,
+    TRIPO_MAX_RPS,
+    TRIPO_MAX_CONCURRENT_POLLS,
+    TRIPO_TASK_TIMEOUT,
+)
+from utils import metrics
+
+FINISHED_STATUSES = (
+    TaskStatus.SUCCESS,
+    TaskStatus.FAILED,
+    TaskStatus.CANCELLED,
+    TaskStatus.BANNED,
+    TaskStatus.EXPIRED,
+)
+
+# Consecutive status-check errors tolerated before a task's waiters get the error
+MAX_POLL_ERRORS = 5
+
+
+class _Tracked:
+    def __init__(self):
+        self.waiters: List[asyncio.Future] = []
+        self.next_check = 0.0
+        self.errors = 0
+        self.checking = False
+        self.last: Optional[Task] = None
+        # (monotonic time, seconds) of the first running_left_time the API gave
+        self.first_estimate: Optional[Tuple[float, float]] = None
+
+
+class TaskPoller:
+    """
+    One polling loop for every in-flight Tripo task in the process.
+
+    Each tick starts a status check for every task that is due, spacing the
+    starts so the loop never exceeds `max_rps`. Checks run concurrently (up
+    to `max_concurrent`), so one slow response doesn't hold up the rest.
+    Waiters are resolved as soon as their task finishes. Tasks that report a long `running_left_time` are
+    checked less often, up to `max_interval`.
+    """
+
+    def __init__(
+        self,
+        client: TripoClient,
+        interval: float = TRIPO_POLL_INTERVAL,
+        max_interval: float = TRIPO_POLL_MAX_INTERVAL,
+        max_rps: float = TRIPO_MAX_RPS,
+        max_concurrent: int = TRIPO_MAX_CONCURRENT_POLLS,
+    ):
+        self.client = client
+        self.interval = interval
+        self.max_interval = max_interval
+        self.min_spacing = 1.0 / max_rps
+        self._tasks: Dict[str, _Tracked] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._checks: Set[asyncio.Task] = set()
+
+    async def wait(self, task_id: str, timeout: Optional[float] = TRIPO_TASK_TIMEOUT) -> Task:
+        """Drop-in replacement for TripoClient.wait_for_task."""
+        tracked = self._tasks.get(task_id)
+        if tracked is None:
+            # Freshly created tasks are never done instantly; first check after one interval
+            tracked = self._tasks[task_id] = _Tracked()
+            tracked.next_check = time.monotonic() + self.interval
+        future = asyncio.get_running_loop().create_future()
+        tracked.waiters.append(future)
+        self._wakeup.set()
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run())
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            if self._tasks.get(task_id) is tracked and future in tracked.waiters:
+                tracked.waiters.remove(future)
+                if not tracked.waiters:
+                    del self._tasks[task_id]
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def close(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+        for check in list(self._checks):
+            check.cancel()
+        await asyncio.gather(*self._checks, return_exceptions=True)
+        for tracked in self._tasks.values():
+            for future in tracked.waiters:
+                if not future.done():
+                    future.cancel()
+        self._tasks.clear()
+
+    async def _run(self):
+        while self._tasks:
+            now = time.monotonic()
+            due = [task_id for task_id, t in self._tasks.items() if t.next_check <= now and not t.checking]
+            for task_id in due:
+                await self._slots.acquire()
+                tracked = self._tasks.get(task_id)
+                if tracked is None:
+                    self._slots.release()
+                    continue
+                tracked.checking = True
+                check = asyncio.create_task(self._check(task_id))
+                self._checks.add(check)
+                check.add_done_callback(self._check_done)
+                # Spacing the starts, not the completions, is what holds us to max_rps
+                await asyncio.sleep(self.min_spacing)
+
+            if not self._tasks:
+                break
+            idle = [t.next_check for t in self._tasks.values() if not t.checking]
+            self._wakeup.clear()
+            # With every task mid-check, a finishing check sets the wakeup
+            timeout = max(0.0, min(idle) - time.monotonic()) if idle else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _check_done(self, check: asyncio.Task):
+        self._checks.discard(check)
+        self._slots.release()
+        self._wakeup.set()
+
+    async def _check(self, task_id: str):
+        tracked = self._tasks.get(task_id)
+        if tracked is None:
+            return
+        try:
+            await self._check_tracked(task_id, tracked)
+        finally:
+            tracked.checking = False
+
+    async def _check_tracked(self, task_id: str, tracked: _Tracked):
+        try:
+            # A hung request counts as a failed check instead of pinning a slot
+            task = await asyncio.wait_for(self.client.get_task(task_id), self.max_interval)
+        except Exception as e:
+            metrics.TRIPO_POLLS.inc(outcome="error")
+            tracked.errors += 1
+            tracked.next_check = time.monotonic() + self.interval * tracked.errors
+            if tracked.errors >= MAX_POLL_ERRORS:
+                self._finish(task_id, error=e)
+            return
+
+        metrics.TRIPO_POLLS.inc(outcome="ok")
+        tracked.errors = 0
+        tracked.last = task
+        if task.running_left_time and tracked.first_estimate is None:
+            tracked.first_estimate = (time.monotonic(), task.running_left_time)
+        if task.status in FINISHED_STATUSES:
+            self._finish(task_id, task=task)
+            return
+
+        delay = self.interval
+        if task.running_left_time:
+            # No point asking again long before the API expects it to be done
+            delay = max(delay, task.running_left_time * 0.5)
+        tracked.next_check = time.monotonic() + min(delay, self.max_interval)
+
+    def _finish(self, task_id: str, task: Optional[Task] = None, error: Optional[Exception] = None):
+        tracked = self._tasks.pop(task_id, None)
+        if tracked is None:
+            return
+        if task is not None and task.status == TaskStatus.SUCCESS and tracked.first_estimate:
+            # How far off the API's ETA was; >1 means the task ran longer than promised
+            reported_at, estimate = tracked.first_estimate
+            metrics.TRIPO_ETA_RATIO.observe((time.monotonic() - reported_at) / estimate)
+        for future in tracked.waiters:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(task)
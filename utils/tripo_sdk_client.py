@@ -1,85 +1,185 @@
+import asyncio
 import os
+from typing import Awaitable, Callable, Optional
+
 from tripo3d import TripoClient, TaskStatus
 from dotenv import load_dotenv
 
+from config.settings import TRIPO3D_BASE_URL
+from utils import metrics
+from utils.tripo_poller import TaskPoller
+
 load_dotenv()
 API_KEY = os.getenv("TRIPO3D_API_KEY")
 
+# One client (and its keep-alive session) and one poller for the whole process
+_client: Optional[TripoClient] = None
+_poller: Optional[TaskPoller] = None
+
+metrics.Gauge("tripo_tasks_in_flight", "Tripo tasks being polled.", lambda: _poller.in_flight() if _poller else 0)
+
+
+def _bytes_on_disk(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths if p and os.path.exists(p))
+
+
+async def open_client():
+    global _client, _poller
+    if _client is None:
+        if TRIPO3D_BASE_URL:
+            # Read by the constructor when it builds the HTTP session
+            TripoClient.BASE_URL = TRIPO3D_BASE_URL.rstrip("/")
+        _client = TripoClient(api_key=API_KEY)
+        _poller = TaskPoller(_client)
+
 
-async def generate_3d_from_images(image_paths: list[str], formats: list[str] = ['glb', 'usdz']):
+async def close_client():
+    global _client, _poller
+    if _poller is not None:
+        await _poller.close()
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _poller = None
+
+
+async def get_client() -> tuple[TripoClient, TaskPoller]:
+    # Opened lazily too, so scripts can call generate_3d_from_images without the app lifespan
+    await open_client()
+    return _client, _poller
+
+
+async def generate_3d_from_images(
+    image_paths: list[str],
+    formats: list[str] = ['glb', 'usdz'],
+    on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+    on_artifact: Optional[Callable[[str, str], Awaitable[None]]] = None,
+):
     """
     Generate 3D model using Tripo3D SDK (single or multi-view)
     Then convert to formats like GLB + USDZ.
+    `on_stage` is awaited with "converting" once the base model is ready.
+    `on_artifact` is awaited with (format, path) as soon as each file is on disk,
+    so callers can start uploading before the slowest conversion finishes.
+    Conversions run concurrently; per-format failures are returned in "errors".
     """
     output_dir = "./output"
     os.makedirs(output_dir, exist_ok=True)
 
-    async with TripoClient(api_key=API_KEY) as client:
-        try:
-            # Choose method based on number of images
+    async def artifact_ready(fmt: str, path: str):
+        if on_artifact:
+            await on_artifact(fmt, path)
+
+    try:
+        client, poller = await get_client()
+        # Choose method based on number of images
+        with metrics.timed("tripo_submit"):
             if len(image_paths) == 1:
                 print("🖼️ Generating 3D model from single image...")
                 task_id = await client.image_to_model(image=image_paths[0])
             else:
                 print(f"🖼️ Generating 3D model from {len(image_paths)} images (multi-view)...")
                 task_id = await client.multiview_to_model(images=image_paths)
+        metrics.TRANSFER_BYTES.inc(_bytes_on_disk(image_paths), peer="tripo", direction="out")
 
-            print(f"🚀 Task started: {task_id}")
-            task = await client.wait_for_task(task_id, verbose=True)
+        print(f"🚀 Task started: {task_id}")
+        metrics.trace("tripo_task", task_id=task_id, kind="generate")
+        with metrics.timed("tripo_wait"):
+            task = await poller.wait(task_id)
 
-            if task.status != TaskStatus.SUCCESS:
-                print("❌ Task failed:", task)
-                return {"status": "failed", "details": str(task)}
+        if task.status != TaskStatus.SUCCESS:
+            print("❌ Task failed:", task)
+            metrics.STAGE_ERRORS.inc(stage="tripo_wait", format="")
+            return {"status": "failed", "details": str(task)}
 
-            print("✅ Base 3D model generated.")
+        print("✅ Base 3D model generated.")
 
+        async def download_base():
             # Download base file (GLB)
-            default_files = await client.download_task_models(task, output_dir)
+            with metrics.timed("download", format="glb"):
+                default_files = await client.download_task_models(task, output_dir)
+            metrics.TRANSFER_BYTES.inc(_bytes_on_disk(default_files.values()), peer="tripo", direction="in")
             print(f"📥 Downloaded base files: {default_files}")
 
             # FIX: Correct key is 'pbr_model'
             pbr_model = default_files.get("pbr_model")
-
-            output_files = {}
-
-            # Convert to additional formats
-            for fmt in formats:
-                try:
-                    format_dir = os.path.join(output_dir, fmt)
-                    os.makedirs(format_dir, exist_ok=True)
-
-                    if fmt == "glb":
-                        if pbr_model:
-                            output_files.setdefault("glb", []).append(pbr_model)
-                            print(f"✔ GLB ready: {pbr_model}")
-                        continue
-
-                    print(f"🔄 Converting GLB → {fmt.upper()} ...")
-                    convert_task_id = await client.convert_model(
-                        original_model_task_id=task_id,
-                        format=fmt
-                    )
-
-                    convert_task = await client.wait_for_task(convert_task_id, verbose=True)
-
-                    if convert_task.status == TaskStatus.SUCCESS:
-                        converted = await client.download_task_models(convert_task, format_dir)
-                        paths = [p for p in converted.values() if p]
-                        output_files[fmt] = paths
-                        print(f"✔ {fmt.upper()} saved: {paths}")
-                    else:
-                        print(f"Conversion to {fmt.upper()} failed")
-
-                except Exception as e:
-                    print(f"Conversion error for {fmt.upper()}: {e}")
-
-            return {
-                "status": "success",
-                "task_id": task_id,
-                "pbr_model": pbr_model,
-                "files": output_files
-            }
-
-        except Exception as e:
-            print("Error:", e)
-            return {"status": "error", "message": str(e)}
+            if pbr_model:
+                print(f"✔ GLB ready: {pbr_model}")
+                await artifact_ready("glb", pbr_model)
+            return pbr_model
+
+        async def convert(fmt: str):
+            format_dir = os.path.join(output_dir, fmt)
+            os.makedirs(format_dir, exist_ok=True)
+
+            print(f"🔄 Converting GLB → {fmt.upper()} ...")
+            with metrics.timed("convert", format=fmt):
+                convert_task_id = await client.convert_model(
+                    original_model_task_id=task_id,
+                    format=fmt
+                )
+                metrics.trace("tripo_task", task_id=convert_task_id, kind="convert", format=fmt)
+
+                with metrics.timed("tripo_wait", format=fmt):
+                    convert_task = await poller.wait(convert_task_id)
+
+                if convert_task.status != TaskStatus.SUCCESS:
+                    raise RuntimeError(f"Conversion task {convert_task_id} ended with status {convert_task.status}")
+
+                with metrics.timed("download", format=fmt):
+                    converted = await client.download_task_models(convert_task, format_dir)
+            paths = [p for p in converted.values() if p]
+            metrics.TRANSFER_BYTES.inc(_bytes_on_disk(paths), peer="tripo", direction="in")
+            if not paths:
+                raise RuntimeError(f"Conversion task {convert_task_id} produced no files")
+            print(f"✔ {fmt.upper()} saved: {paths}")
+            for path in paths:
+                await artifact_ready(fmt, path)
+            return paths
+
+        conversions = [fmt for fmt in formats if fmt != "glb"]
+        if on_stage and conversions:
+            await on_stage("converting")
+
+        # Conversions only need the base task id, so they start right away
+        # alongside the base download instead of one after another.
+        base_result, *converted = await asyncio.gather(
+            download_base(),
+            *(convert(fmt) for fmt in conversions),
+            return_exceptions=True,
+        )
+
+        output_files = {}
+        errors = {}
+
+        if isinstance(base_result, Exception):
+            print(f"Download error for GLB: {base_result}")
+            errors["glb"] = str(base_result)
+            pbr_model = None
+        else:
+            pbr_model = base_result
+            if "glb" in formats and pbr_model:
+                output_files["glb"] = [pbr_model]
+
+        for fmt, outcome in zip(conversions, converted):
+            if isinstance(outcome, Exception):
+                print(f"Conversion error for {fmt.upper()}: {outcome}")
+                errors[fmt] = str(outcome)
+            else:
+                output_files[fmt] = outcome
+
+        if not output_files:
+            # Nothing to upload; don't let the caller report a model that doesn't exist
+            return {"status": "error", "message": "No model files were produced", "task_id": task_id, "errors": errors}
+
+        return {
+            "status": "success",
+            "task_id": task_id,
+            "pbr_model": pbr_model,
+            "files": output_files,
+            "errors": errors
+        }
+
+    except Exception as e:
+        print("Error:", e)
+        return {"status": "error", "message": str(e)}
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import re
+import shutil
+import uuid
+from typing import List, Optional, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+from starlette.responses import JSONResponse
+
+from config.settings import UPLOAD_DIR, MAX_UPLOAD_FILES, MAX_UPLOAD_BYTES
+from utils import metrics
+
+CHUNK_SIZE = 256 * 1024
+# Allowance for multipart boundaries, part headers and form fields
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_REQUEST_BYTES = MAX_UPLOAD_FILES * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD)
+
+
+class UploadRejectedError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Answer 413 from the Content-Length header alone when a request to `paths`
+    can't fit MAX_UPLOAD_FILES files of MAX_UPLOAD_BYTES, before the form is
+    parsed and spooled to disk. Bodies without a Content-Length are still
+    checked by save_uploads as they stream.
+    """
+
+    def __init__(self, app, paths: Tuple[str, ...]):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > MAX_REQUEST_BYTES:
+                response = JSONResponse(
+                    status_code=413,
+                    content={
+                        "status": "error",
+                        "message": f"Request is larger than {MAX_REQUEST_BYTES // (1024 * 1024)} MB",
+                    },
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def new_workspace(workspace_id: Optional[str] = None) -> str:
+    """Create an isolated directory under UPLOAD_DIR for one job's files."""
+    path = os.path.join(UPLOAD_DIR, workspace_id or uuid.uuid4().hex)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+async def remove_workspace(path: str):
+    await asyncio.to_thread(shutil.rmtree, path, True)
+
+
+def _safe_name(filename: Optional[str], index: int) -> str:
+    name = os.path.basename(filename or "")
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".")
+    # Index prefix keeps duplicate names within one request apart
+    return f"{index:02d}_{name or 'image'}"
+
+
+async def save_uploads(files: List[UploadFile], workspace: str) -> List[str]:
+    """
+    Stream each upload into the workspace without blocking the event loop.
+    Raises UploadRejectedError (413) past MAX_UPLOAD_FILES or MAX_UPLOAD_BYTES per file.
+    """
+    if len(files) > MAX_UPLOAD_FILES:
+        raise UploadRejectedError(413, f"At most {MAX_UPLOAD_FILES} images per request")
+
+    saved_files = []
+    for i, f in enumerate(files):
+        save_path = os.path.join(workspace, _safe_name(f.filename, i))
+        written = 0
+        async with aiofiles.open(save_path, "wb") as buffer:
+            while chunk := await f.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise UploadRejectedError(
+                        413, f"{f.filename} is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+                    )
+                await buffer.write(chunk)
+        metrics.TRANSFER_BYTES.inc(written, peer="client", direction="in")
+        saved_files.append(save_path)
+    return saved_files